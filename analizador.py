@@ -12,6 +12,8 @@ Características:
 - Mapeos tipo evento: izquierda -> derecha (p.ej., colision -> perder_vida)
 - Comas entre entradas dentro de bloques (coma final opcional)
 - Tipos: NUMBER (int/float), STRING ("..."), BOOL (true/false)
+- LexerRapido: misma gramática de tokens con una sola expresión regular
+- LexerFlujo: lectura por bloques desde archivo o mmap (--stream)
 
 Salida:
 - Imprime en stdout un AST en JSON.
@@ -19,22 +21,34 @@ Salida:
 Uso:
     python analizador.py archivo.brik
     python analizador.py archivo.brik --pretty
+    python analizador.py archivo.brik --stream
+    python analizador.py archivo.brik --cache   (solo regenera arbol.ast si el .brik cambió)
+    python analizador.py niveles/ "variantes/**/*.brik" -j 8 [--validar]
+    python analizador.py archivo.brik --empaquetar   (matrices numéricas como buffers)
 """
 from __future__ import annotations
 
+import os
 import sys
+import glob
 import json
+import io
 import re
-from dataclasses import dataclass
-from typing import Any, Optional, List, Dict
+import mmap
+import codecs
+import base64
+import hashlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from bisect import bisect_left, bisect_right
+from typing import Any, Optional, List, Dict, Union, Iterator, NamedTuple
 from pathlib import Path
 
 # --------------------
 # Tokens y errores
 # --------------------
 
-@dataclass
-class Token:
+class Token(NamedTuple):
     type: str
     value: Any
     line: int
@@ -162,7 +176,7 @@ class Lexer:
         # identifier
         m = _re_ident.match(self.text, self.i)
         if m:
-            ident = m.group(0)
+            ident = sys.intern(m.group(0))
             tok = Token('IDENT', ident, self.line, self.col)
             self._advance(len(ident))
             return tok
@@ -172,23 +186,327 @@ class Lexer:
     def _is_ident_char(self, ch: str) -> bool:
         return bool(ch) and (ch.isalnum() or ch == '_')
 
+# --------------------
+# Lexer rápido (una sola expresión regular)
+# --------------------
+
+# El orden de las alternativas reproduce el orden de prueba de Lexer.next():
+# espacios/comentarios, símbolos, '->', cadena, bool, número, identificador.
+_re_maestra = re.compile(r'''
+    (?P<WS>[ \t\r\n]+)
+  | (?P<COMENTARIO>//[^\n]*)
+  | (?P<BLOQUE>/\*(?s:.*?)\*/)
+  | (?P<BLOQUE_ABIERTO>/\*)
+  | (?P<SIMBOLO>[{}\[\],=])
+  | (?P<ARROW>->)
+  | (?P<STRING>"(?:[^"\\]|\\.)*")
+  | (?P<BOOL>(?:true|false)(?!\w))
+  | (?P<NUMBER>-?[0-9]+(?:\.[0-9]+)?)
+  | (?P<IDENT>(?i:[a-z_][a-z0-9_]*))
+''', re.VERBOSE)
+
+_SIMBOLOS = {
+    '{': 'LBRACE', '}': 'RBRACE',
+    '[': 'LBRACK', ']': 'RBRACK',
+    ',': 'COMMA', '=': 'EQUAL',
+}
+
+_IGNORADOS = frozenset(('WS', 'COMENTARIO', 'BLOQUE'))
+
+# Cuerpo de una cadena (sin las comillas), para completarla entre bloques
+_re_cuerpo_cadena = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*')
+
+class TokenDiferido:
+    """Token del LexerRapido: línea y columna se calculan solo al consultarlas"""
+    __slots__ = ('type', 'value', 'pos', '_lexer')
+
+    def __init__(self, type: str, value: Any, pos: int, lexer: 'LexerRapido'):
+        self.type = type
+        self.value = value
+        self.pos = pos
+        self._lexer = lexer
+
+    @property
+    def line(self) -> int:
+        return self._lexer.linea_col(self.pos)[0]
+
+    @property
+    def col(self) -> int:
+        return self._lexer.linea_col(self.pos)[1]
+
+    def __repr__(self) -> str:
+        return f"TokenDiferido(type={self.type!r}, value={self.value!r}, pos={self.pos})"
+
+class LexerRapido:
+    """
+    Lexer equivalente a Lexer, pero de una sola pasada con una expresión
+    regular maestra. Produce los mismos tipos de token y los mismos mensajes
+    de error; la línea/columna se obtiene de un índice de saltos de línea
+    que se construye únicamente cuando un token o un error la necesita.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.i = 0
+        self.n = len(text)
+        self._saltos: Optional[List[int]] = None
+
+    def linea_col(self, pos: int) -> tuple:
+        """Convierte un desplazamiento en (línea, columna), ambas desde 1"""
+        if self._saltos is None:
+            self._saltos = [m.start() for m in re.finditer('\n', self.text)]
+        k = bisect_left(self._saltos, pos)
+        inicio = self._saltos[k - 1] + 1 if k else 0
+        return k + 1, pos - inicio + 1
+
+    def next(self) -> TokenDiferido:
+        text = self.text
+        i = self.i
+        while True:
+            m = _re_maestra.match(text, i)
+            if m is None:
+                if i >= self.n:
+                    self.i = i
+                    return TokenDiferido('EOF', None, i, self)
+                line, col = self.linea_col(i)
+                raise LexerError(f"Caracter inesperado '{text[i]}' en línea {line}, col {col}")
+            kind = m.lastgroup
+            if kind not in _IGNORADOS:
+                break
+            i = m.end()
+
+        self.i = m.end()
+        if kind == 'BLOQUE_ABIERTO':
+            line, col = self.linea_col(i)
+            raise LexerError(f"Comentario de bloque sin cerrar iniciado en línea {line}, col {col}")
+        ttype, value = _valor_token(kind, m.group())
+        return TokenDiferido(ttype, value, i, self)
+
+def _valor_token(kind: str, s: str) -> tuple:
+    """Traduce un grupo de _re_maestra y su texto a (tipo de token, valor)"""
+    if kind == 'SIMBOLO':
+        return _SIMBOLOS[s], s
+    if kind == 'IDENT':
+        # los identificadores se repiten mucho como claves: se internan
+        return 'IDENT', sys.intern(s)
+    if kind == 'NUMBER':
+        return 'NUMBER', float(s) if '.' in s else int(s)
+    if kind == 'STRING':
+        # decodifica secuencias de escape estándar
+        return 'STRING', bytes(s[1:-1], 'utf-8').decode('unicode_escape')
+    if kind == 'BOOL':
+        return 'BOOL', s == 'true'
+    return 'ARROW', '->'
+
+# --------------------
+# Lexer por flujo (archivo o mmap, memoria acotada)
+# --------------------
+
+class LexerFlujo:
+    """
+    Lexer incremental que lee la entrada por bloques desde un archivo abierto
+    (texto o binario) o un mmap, sin cargar el documento completo.
+
+    Solo mantiene en memoria el bloque actual más el token pendiente, de modo
+    que tokens y comentarios que cruzan el límite entre bloques se completan
+    leyendo el siguiente. Las fuentes binarias se decodifican como UTF-8 con
+    traducción de saltos de línea universal, igual que open(..., 'r').
+    """
+
+    TAM_BLOQUE = 1 << 16
+
+    def __init__(self, fuente: Any, tam_bloque: int = TAM_BLOQUE):
+        self.fuente = fuente
+        self.tam_bloque = tam_bloque
+        self.buf = ''
+        self.i = 0
+        self.eof = False
+        self._decoder: Optional[io.IncrementalNewlineDecoder] = None
+        # línea/columna correspondientes a buf[self._cursor]
+        self._cursor = 0
+        self.line = 1
+        self.col = 1
+
+    def _leer_texto(self) -> str:
+        """Lee y decodifica el siguiente bloque de la fuente ('' al final)"""
+        chunk = self.fuente.read(self.tam_bloque)
+        if isinstance(chunk, (bytes, bytearray)):
+            if self._decoder is None:
+                self._decoder = io.IncrementalNewlineDecoder(
+                    codecs.getincrementaldecoder('utf-8')(), translate=True)
+            texto = self._decoder.decode(chunk, final=not chunk)
+        else:
+            texto = chunk
+        if not chunk:
+            self.eof = True
+        return texto
+
+    def _leer(self) -> None:
+        """Descarta lo ya consumido del buffer y agrega el siguiente bloque"""
+        texto = self._leer_texto()
+        self._posicionar(self.i)
+        self.buf = self.buf[self.i:] + texto
+        self._cursor = 0
+        self.i = 0
+
+    def _saltar_comentario(self, cierre: str) -> None:
+        """
+        buf[self.i:] empieza un comentario ('/*' o '//') que sigue en los
+        próximos bloques: busca 'cierre' solo en el texto nuevo y descarta lo
+        ya recorrido, así un comentario largo cuesta tiempo lineal y la
+        memoria de un bloque. Deja self.i justo después del comentario.
+        """
+        self._posicionar(self.i)
+        linea, col = self.line, self.col
+        desde = self.i + 2
+        while True:
+            fin = self.buf.find(cierre, desde)
+            if fin != -1:
+                # '*/' es parte del comentario; el '\n' de '//' no
+                self.i = fin + 2 if cierre == '*/' else fin
+                return
+            if self.eof:
+                if cierre == '*/':
+                    raise LexerError(f"Comentario de bloque sin cerrar iniciado en línea {linea}, col {col}")
+                self.i = len(self.buf)
+                return
+            # Solo se conserva el último carácter (un '*' que cierre con el
+            # '/' del bloque siguiente), nunca el '*' de la apertura
+            self.i = max(desde, len(self.buf) - len(cierre) + 1)
+            self._leer()
+            desde = 0
+
+    def _completar_cadena(self) -> bool:
+        """
+        buf[self.i:] empieza una cadena que sigue en los próximos bloques:
+        los lee buscando la comilla de cierre solo en el texto nuevo y arma
+        el buffer una única vez (tiempo lineal en el largo de la cadena).
+        Retorna False si no leyó nada: la cadena ya no puede completarse.
+        """
+        leido = False
+        self._posicionar(self.i)
+        partes = [self.buf[self.i:]]
+        self.buf = ''
+        self._cursor = 0
+        self.i = 0
+        # lo que queda por revisar: el cuerpo de la cadena tras la comilla
+        resto = partes[0][1:]
+        while True:
+            pendiente = resto[_re_cuerpo_cadena.match(resto).end():]
+            if pendiente and pendiente != '\\':
+                # la comilla de cierre (o un escape inválido, que reporta next())
+                break
+            # se llegó al final, o a una '\' cuyo par llega en el bloque siguiente
+            if self.eof:
+                break
+            # el decodificador puede retener un carácter a medias (o un '\r'
+            # final) y devolver '' sin que la fuente haya terminado
+            texto = self._leer_texto()
+            leido = True
+            if texto:
+                partes.append(texto)
+                resto = pendiente + texto
+        self.buf = ''.join(partes)
+        return leido
+
+    def _posicionar(self, p: int) -> None:
+        """Avanza la línea/columna registrada hasta buf[p]"""
+        saltos = self.buf.count('\n', self._cursor, p)
+        if saltos:
+            self.line += saltos
+            self.col = p - self.buf.rfind('\n', self._cursor, p)
+        else:
+            self.col += p - self._cursor
+        self._cursor = p
+
+    def next(self) -> Token:
+        while True:
+            m = _re_maestra.match(self.buf, self.i)
+            if not self.eof:
+                # Comentarios y cadenas que siguen en el próximo bloque: se
+                # busca su fin solo en el texto nuevo, sin volver a analizar
+                # desde el comienzo del token con cada bloque
+                kind = m.lastgroup if m is not None else None
+                if kind == 'BLOQUE_ABIERTO':
+                    self._saltar_comentario('*/')
+                    continue
+                if m is not None and m.end() == len(self.buf) and kind in ('WS', 'COMENTARIO'):
+                    if kind == 'WS':
+                        self.i = m.end()
+                        self._leer()
+                    else:
+                        self._saltar_comentario('\n')
+                    continue
+            if not self.eof and m is None and self.buf.startswith('"', self.i):
+                # Si no puede completarse (escape inválido) se reporta el
+                # error ya, igual que al final de la entrada
+                if self._completar_cadena():
+                    continue
+            elif not self.eof and (m is None or m.end() + 2 > len(self.buf)):
+                # Un token que toca el final del buffer (o le faltan hasta 2
+                # caracteres de anticipación, p.ej. '1' + '.5') puede seguir
+                # en el próximo bloque: se lee más antes de decidir.
+                self._leer()
+                continue
+            if m is None:
+                self._posicionar(self.i)
+                if self.i >= len(self.buf):
+                    return Token('EOF', None, self.line, self.col)
+                raise LexerError(f"Caracter inesperado '{self.buf[self.i]}' en línea {self.line}, col {self.col}")
+            kind = m.lastgroup
+            if kind not in _IGNORADOS:
+                break
+            self.i = m.end()
+
+        self._posicionar(self.i)
+        self.i = m.end()
+        if kind == 'BLOQUE_ABIERTO':
+            raise LexerError(f"Comentario de bloque sin cerrar iniciado en línea {self.line}, col {self.col}")
+        ttype, value = _valor_token(kind, m.group())
+        return Token(ttype, value, self.line, self.col)
+
+    def tokens(self) -> Iterator[Token]:
+        """Generador de tokens hasta EOF (sin incluirlo)"""
+        while True:
+            tok = self.next()
+            if tok.type == 'EOF':
+                return
+            yield tok
+
+    __iter__ = tokens
+
+def analizar_flujo(path: str, tam_bloque: int = LexerFlujo.TAM_BLOQUE,
+                   empaquetar_matrices: bool = False) -> Dict[str, Any]:
+    """Analiza un .brik leyéndolo por bloques desde un mmap del archivo"""
+    with open(path, 'rb') as f:
+        try:
+            fuente = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # mmap no admite archivos vacíos
+            return Parser(LexerFlujo(f, tam_bloque), empaquetar_matrices).parse()
+        with fuente:
+            return Parser(LexerFlujo(fuente, tam_bloque), empaquetar_matrices).parse()
+
 # --------------------
 # Parser
 # --------------------
 
 class Parser:
-    def __init__(self, lexer: Lexer):
+    def __init__(self, lexer: Union[Lexer, LexerRapido, LexerFlujo], empaquetar_matrices: bool = False):
         self.lexer = lexer
-        self.cur: Token = self.lexer.next()
+        # Si es True, las listas de listas numéricas rectangulares se
+        # guardan como MatrizEmpaquetada en lugar de listas anidadas
+        self.empaquetar_matrices = empaquetar_matrices
+        self.cur: Union[Token, TokenDiferido] = self.lexer.next()
 
-    def _eat(self, ttype: str) -> Token:
+    def _eat(self, ttype: str) -> Union[Token, TokenDiferido]:
         if self.cur.type != ttype:
             self._error(f"Se esperaba {ttype}, se encontró {self.cur.type}")
         tok = self.cur
         self.cur = self.lexer.next()
         return tok
 
-    def _accept(self, ttype: str) -> Optional[Token]:
+    def _accept(self, ttype: str) -> Optional[Union[Token, TokenDiferido]]:
         if self.cur.type == ttype:
             tok = self.cur
             self.cur = self.lexer.next()
@@ -201,32 +519,46 @@ class Parser:
     def parse(self) -> Dict[str, Any]:
         doc: Dict[str, Any] = {}
         while self.cur.type != 'EOF':
-            if self.cur.type != 'IDENT':
-                self._error("Se esperaba un identificador al inicio de una declaración")
-            name = self._eat('IDENT').value
-
-            if self._accept('EQUAL'):
-                value = self._parse_value()
+            name, value, es_bloque = self._parse_declaracion()
+            if not es_bloque:
                 doc[name] = value
-            elif self.cur.type == 'LBRACE':
-                block = self._parse_block()
-                if name in doc and isinstance(doc[name], dict) and isinstance(block, dict):
-                    # merge simple
-                    doc[name].update(block)
-                elif name in doc:
-                    self._error(f"Bloque duplicado '{name}' incompatible")
-                else:
-                    doc[name] = block
+            elif name in doc and isinstance(doc[name], dict) and isinstance(value, dict):
+                # merge simple
+                doc[name].update(value)
+            elif name in doc:
+                self._error(f"Bloque duplicado '{name}' incompatible")
             else:
-                self._error("Se esperaba '=' o '{' después del identificador")
+                doc[name] = value
         return doc
 
+    # declaración: IDENT '=' value | IDENT '{' ... '}'
+    # Retorna (nombre, valor, es_bloque)
+    def _parse_declaracion(self) -> tuple:
+        if self.cur.type != 'IDENT':
+            self._error("Se esperaba un identificador al inicio de una declaración")
+        name = self._eat('IDENT').value
+
+        if self._accept('EQUAL'):
+            return name, self._parse_value(), False
+        if self.cur.type == 'LBRACE':
+            return name, self._parse_block(), True
+        self._error("Se esperaba '=' o '{' después del identificador")
+
     # Bloque: { entry (, entry)* (,)? }
+    #
+    # Cada entrada se reduce directamente sobre el dict resultado:
+    # - asignaciones: {name: value}
+    # - subbloques: {name: dict}
+    # - mapeos: acumulados en clave especial "_mappings" como lista de pares
     def _parse_block(self) -> Dict[str, Any]:
         self._eat('LBRACE')
-        entries: List[Any] = []
+        result: Dict[str, Any] = {}
+        mappings: List[Dict[str, str]] = []
+        duplicado: Optional[str] = None
         while self.cur.type != 'RBRACE':
-            entries.append(self._parse_entry())
+            dup = self._parse_entry(result, mappings)
+            if duplicado is None:
+                duplicado = dup
             # Separador: coma opcional O inicio de una nueva entrada (IDENT) en la línea siguiente
             if self._accept('COMMA'):
                 # permitir coma final
@@ -241,36 +573,10 @@ class Parser:
             self._error("Se esperaba ',' o nuevo identificador o '}' en bloque")
         self._eat('RBRACE')
 
-        # Reducir entries a un dict:
-        # - asignaciones: {name: value}
-        # - subbloques: {name: dict}
-        # - mapeos: acumulados en clave especial "_mappings" como lista de pares
-        result: Dict[str, Any] = {}
-        mappings: List[Dict[str, str]] = []
-
-        for e in entries:
-            if e['type'] == 'assign':
-                k = e['name']
-                v = e['value']
-                if k in result and isinstance(result[k], dict) and isinstance(v, dict):
-                    result[k].update(v)
-                elif k in result and not isinstance(result[k], list):
-                    # Si ya existe y no es bloque repetible, sobreescribe
-                    result[k] = v
-                else:
-                    result[k] = v
-            elif e['type'] == 'block':
-                k = e['name']
-                v = e['value']
-                if k in result and isinstance(result[k], dict):
-                    result[k].update(v)
-                elif k in result:
-                    self._error(f"Entrada duplicada incompatible '{k}'")
-                else:
-                    result[k] = v
-            elif e['type'] == 'map':
-                mappings.append({'from': e['left'], 'to': e['right']})
-
+        # El conflicto se reporta tras cerrar el bloque, como cuando las
+        # entradas se reducían al final.
+        if duplicado is not None:
+            self._error(f"Entrada duplicada incompatible '{duplicado}'")
         if mappings:
             result['_mappings'] = mappings
         return result
@@ -278,7 +584,10 @@ class Parser:
     # entry: IDENT '=' value
     #      | IDENT '{' ... '}'
     #      | IDENT '->' IDENT_OR_STRING
-    def _parse_entry(self) -> Dict[str, Any]:
+    #
+    # Escribe la entrada en 'result' (o 'mappings'). Retorna el nombre si es
+    # un subbloque que choca con un valor previo que no es bloque.
+    def _parse_entry(self, result: Dict[str, Any], mappings: List[Dict[str, str]]) -> Optional[str]:
         if self.cur.type != 'IDENT':
             self._error("Se esperaba un identificador dentro del bloque")
         name = self._eat('IDENT').value
@@ -286,17 +595,29 @@ class Parser:
         # mapping
         if self._accept('ARROW'):
             right = self._parse_ident_or_string()
-            return {'type': 'map', 'left': name, 'right': right}
+            mappings.append({'from': name, 'to': right})
+            return None
 
         # assignment
         if self._accept('EQUAL'):
             val = self._parse_value()
-            return {'type': 'assign', 'name': name, 'value': val}
+            prev = result.get(name)
+            if isinstance(prev, dict) and isinstance(val, dict):
+                prev.update(val)
+            else:
+                result[name] = val
+            return None
 
         # nested block
         if self.cur.type == 'LBRACE':
             block = self._parse_block()
-            return {'type': 'block', 'name': name, 'value': block}
+            if name not in result:
+                result[name] = block
+            elif isinstance(result[name], dict):
+                result[name].update(block)
+            else:
+                return name
+            return None
 
         self._error("Se esperaba '->', '=' o '{' tras el identificador")
 
@@ -323,7 +644,7 @@ class Parser:
         self._error(f"Valor no válido (encontrado {t})")
 
     # list: '[' (value (',' value)*)? ']'
-    def _parse_list(self) -> List[Any]:
+    def _parse_list(self) -> Union[List[Any], 'MatrizEmpaquetada']:
         self._eat('LBRACK')
         items: List[Any] = []
         if self.cur.type != 'RBRACK':
@@ -333,47 +654,573 @@ class Parser:
                     break
                 items.append(self._parse_value())
         self._eat('RBRACK')
+        if self.empaquetar_matrices and items and type(items[0]) is list:
+            matriz = MatrizEmpaquetada.desde_listas(items)
+            if matriz is not None:
+                return matriz
         return items
 
 # --------------------
-# CLI
+# Matrices numéricas empaquetadas (--empaquetar)
 # --------------------
 
-def main(argv: List[str]) -> int:
-    if len(argv) < 2:
-        print("Uso: python analizador.py archivo.brik [--pretty]", file=sys.stderr)
-        return 2
-    path = argv[1]
-    pretty = '--pretty' in argv[2:]
+# Clave con la que una matriz empaquetada se escribe en arbol.ast; '$' no es
+# válido en identificadores del DSL, así que no choca con bloques reales.
+CLAVE_MATRIZ = '$matriz'
+
+class MatrizEmpaquetada:
+    """
+    Lista de listas numérica rectangular guardada como un buffer plano
+    (bytes, tipo de array) con su forma (filas, columnas).
+
+    Se comporta como una secuencia de filas, donde cada fila es un
+    memoryview sin copia, de modo que el código que usa matriz[i][j],
+    len(matriz) o 'for fila in matriz' funciona igual que con listas.
+    """
+    __slots__ = ('datos', 'tipo', 'forma')
+
+    def __init__(self, datos: bytes, tipo: str, forma: tuple):
+        self.datos = datos
+        self.tipo = tipo
+        self.forma = forma
+
+    @classmethod
+    def desde_listas(cls, filas: List[Any]) -> Optional['MatrizEmpaquetada']:
+        """Empaqueta 'filas' si es rectangular y toda de int (o toda de float); si no, None"""
+        if not filas or not all(type(f) is list for f in filas):
+            return None
+        columnas = len(filas[0])
+        if columnas == 0 or any(len(f) != columnas for f in filas):
+            return None
+        plano = [x for f in filas for x in f]
+        tipos = set(map(type, plano))
+        if tipos == {float}:
+            candidatos = 'd'
+        elif tipos == {int}:
+            candidatos = 'bhiq'   # el más chico que alcance
+        else:
+            return None
+        for tipo in candidatos:
+            try:
+                datos = array(tipo, plano).tobytes()
+            except OverflowError:
+                continue
+            return cls(datos, tipo, (len(filas), columnas))
+        return None
+
+    @property
+    def filas(self) -> int:
+        return self.forma[0]
 
+    @property
+    def columnas(self) -> int:
+        return self.forma[1]
+
+    def vista(self) -> memoryview:
+        """memoryview 2D de solo lectura (filas, columnas) sobre el buffer, sin copiar"""
+        return memoryview(self.datos).cast(self.tipo, self.forma)
+
+    def tolist(self) -> List[List[Any]]:
+        return self.vista().tolist()
+
+    def __len__(self) -> int:
+        return self.forma[0]
+
+    def __getitem__(self, i: int) -> memoryview:
+        filas, columnas = self.forma
+        if i < 0:
+            i += filas
+        if not 0 <= i < filas:
+            raise IndexError("índice de fila fuera de rango")
+        return memoryview(self.datos).cast(self.tipo)[i * columnas:(i + 1) * columnas]
+
+    def __iter__(self) -> Iterator[memoryview]:
+        plano = memoryview(self.datos).cast(self.tipo)
+        columnas = self.forma[1]
+        for i in range(self.forma[0]):
+            yield plano[i * columnas:(i + 1) * columnas]
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, MatrizEmpaquetada):
+            return (self.forma, self.tipo, self.datos) == (other.forma, other.tipo, other.datos)
+        if isinstance(other, list):
+            return self.tolist() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"MatrizEmpaquetada(tipo={self.tipo!r}, forma={self.forma})"
+
+    def a_json(self) -> Dict[str, Any]:
+        """Representación en arbol.ast (datos little-endian en base64)"""
+        datos = self.datos
+        if sys.byteorder == 'big':
+            arr = array(self.tipo)
+            arr.frombytes(datos)
+            arr.byteswap()
+            datos = arr.tobytes()
+        return {CLAVE_MATRIZ: {
+            'forma': list(self.forma),
+            'tipo': self.tipo,
+            'datos': base64.b64encode(datos).decode('ascii'),
+        }}
+
+def json_default(obj: Any) -> Any:
+    """'default' para json.dump: serializa las matrices empaquetadas"""
+    if isinstance(obj, MatrizEmpaquetada):
+        return obj.a_json()
+    raise TypeError(f"Objeto de tipo {type(obj).__name__} no serializable")
+
+def decodificar_json(d: Dict[str, Any]) -> Any:
+    """'object_hook' para json.load: reconstruye las matrices empaquetadas"""
+    m = d.get(CLAVE_MATRIZ)
+    if m is None or len(d) != 1:
+        return d
+    datos = base64.b64decode(m['datos'])
+    if sys.byteorder == 'big':
+        arr = array(m['tipo'])
+        arr.frombytes(datos)
+        arr.byteswap()
+        datos = arr.tobytes()
+    return MatrizEmpaquetada(datos, m['tipo'], tuple(m['forma']))
+
+# --------------------
+# Re-análisis incremental
+# --------------------
+
+_AUSENTE = object()
+
+class _Declaracion:
+    """Declaración de nivel superior ya analizada y su posición en el texto"""
+    __slots__ = ('nombre', 'valor', 'es_bloque', 'pos')
+
+    def __init__(self, nombre: str, valor: Any, es_bloque: bool, pos: int):
+        self.nombre = nombre
+        self.valor = valor
+        self.es_bloque = es_bloque
+        self.pos = pos
+
+def _prefijo_comun(a: str, b: str) -> int:
+    """Longitud del prefijo común (búsqueda binaria comparando rebanadas)"""
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def _sufijo_comun(a: str, b: str, limite: int) -> int:
+    """Longitud del sufijo común, sin superar 'limite' caracteres"""
+    na, nb = len(a), len(b)
+    lo, hi = 0, limite
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[na - mid:na - lo] == b[nb - mid:nb - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+class ParserIncremental:
+    """
+    Mantiene el último análisis de un documento .brik y, ante una edición,
+    vuelve a lexear y parsear solo las declaraciones de nivel superior cuyo
+    texto cambió, insertando el resultado en el mismo dict del AST.
+
+    Cada declaración ocupa el rango [pos, pos siguiente) del texto (la primera
+    empieza en 0), de modo que espacios y comentarios pertenecen a la
+    declaración anterior.
+
+    Uso:
+        inc = ParserIncremental(texto)
+        cambios = inc.actualizar(texto_editado)   # p.ej. ['reglas']
+        inc.ast                                   # mismo dict, actualizado
+    """
+
+    def __init__(self, texto: str = '', empaquetar_matrices: bool = False):
+        self.texto = ''
+        self.empaquetar_matrices = empaquetar_matrices
+        self.ast: Dict[str, Any] = {}
+        self._decls: List[_Declaracion] = []
+        self.actualizar(texto)
+
+    def actualizar(self, texto: str) -> List[str]:
+        """
+        Aplica el nuevo texto y retorna las claves de nivel superior cuyo
+        valor cambió (agregadas, modificadas o eliminadas). Si el texto nuevo
+        tiene errores se lanza LexerError/ParserError y el estado no cambia.
+        """
+        viejo = self.texto
+        decls = self._decls
+        p = _prefijo_comun(viejo, texto)
+        s = _sufijo_comun(viejo, texto, min(len(viejo), len(texto)) - p)
+        delta = len(texto) - len(viejo)
+        fin_editado = len(texto) - s
+
+        # Primera declaración afectada: la que contiene p-2, porque el último
+        # token de la anterior pudo mirar hasta 2 caracteres por delante.
+        posiciones = [d.pos for d in decls]
+        k = max(0, bisect_right(posiciones, max(0, p - 2)) - 1)
+        inicio = decls[k].pos if k else 0
+
+        lexer = LexerRapido(texto)
+        lexer.i = inicio
+        parser = Parser(lexer, self.empaquetar_matrices)
+        nuevas: List[_Declaracion] = []
+        ultima = {d.nombre: d for d in decls[:k]}
+        j = len(decls)
+        while parser.cur.type != 'EOF':
+            pos = parser.cur.pos
+            if pos >= fin_editado:
+                # Resincroniza con una declaración vieja que empieza en el
+                # mismo punto del sufijo sin cambios.
+                m = bisect_left(posiciones, pos - delta, k)
+                if m < len(decls) and posiciones[m] == pos - delta:
+                    j = m
+                    break
+            nombre, valor, es_bloque = parser._parse_declaracion()
+            previa = ultima.get(nombre)
+            if es_bloque and previa is not None and not previa.es_bloque and not isinstance(previa.valor, dict):
+                parser._error(f"Bloque duplicado '{nombre}' incompatible")
+            d = _Declaracion(nombre, valor, es_bloque, pos)
+            ultima[nombre] = d
+            nuevas.append(d)
+
+        restantes = decls[j:]
+        for d in restantes:
+            d.pos += delta
+        todas = decls[:k] + nuevas + restantes
+        afectadas = {d.nombre for d in decls[k:j]} | {d.nombre for d in nuevas}
+
+        try:
+            nuevos_valores = self._reducir(todas, afectadas, lexer)
+        except ParserError:
+            for d in restantes:
+                d.pos -= delta
+            raise
+        self.texto = texto
+        self._decls = todas
+
+        ast = self.ast
+        previo = {nombre: i for i, nombre in enumerate(ast)}
+        cambios = []
+        for nombre in afectadas:
+            valor = nuevos_valores.get(nombre, _AUSENTE)
+            anterior = ast.get(nombre, _AUSENTE)
+            if valor is _AUSENTE:
+                del ast[nombre]
+            else:
+                ast[nombre] = valor
+            if anterior is _AUSENTE or valor is _AUSENTE or anterior != valor:
+                cambios.append(nombre)
+
+        # Mantener el orden de claves de un análisis completo
+        orden = list(dict.fromkeys(d.nombre for d in todas))
+        if list(ast) != orden:
+            pares = [(nombre, ast.pop(nombre)) for nombre in orden]
+            ast.update(pares)
+        posicion = {nombre: i for i, nombre in enumerate(orden)}
+        # claves vigentes en el orden del AST; luego las eliminadas
+        cambios.sort(key=lambda n: (posicion.get(n, len(orden)), previo.get(n, 0)))
+        return cambios
+
+    def _reducir(self, decls: List[_Declaracion], nombres: set, lexer: LexerRapido) -> Dict[str, Any]:
+        """Recalcula el valor final de las claves indicadas, como Parser.parse()"""
+        valores: Dict[str, Any] = {}
+        copiados = set()
+        for idx, d in enumerate(decls):
+            nombre = d.nombre
+            if nombre not in nombres:
+                continue
+            actual = valores.get(nombre, _AUSENTE)
+            if not d.es_bloque or actual is _AUSENTE:
+                valores[nombre] = d.valor
+                copiados.discard(nombre)
+            elif isinstance(actual, dict):
+                # se copia para no alterar el valor guardado de otra declaración
+                if nombre not in copiados:
+                    actual = valores[nombre] = dict(actual)
+                    copiados.add(nombre)
+                actual.update(d.valor)
+            else:
+                fin = decls[idx + 1].pos if idx + 1 < len(decls) else len(lexer.text)
+                line, col = lexer.linea_col(fin)
+                raise ParserError(f"Bloque duplicado '{nombre}' incompatible (línea {line}, col {col})")
+        return valores
+
+# --------------------
+# Caché de compilación (--cache)
+# --------------------
+
+# Forma parte de la huella: cambiarla invalida todos los arbol.ast en caché
+VERSION_ANALIZADOR = '2.0.0'
+
+NOMBRE_MANIFIESTO = '.arbol.ast.manifest'
+
+def huella_fuente(path: str, variante: str = '') -> str:
+    """
+    SHA-256 del .brik junto con la versión del analizador y la variante de
+    salida (opciones que cambian el arbol.ast, p.ej. 'empaquetar')
+    """
+    h = hashlib.sha256()
+    h.update(f"{VERSION_ANALIZADOR}\0{variante}\0".encode('utf-8'))
+    with open(path, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+def _ruta_manifiesto(path: str) -> Path:
+    return Path(path).with_name(NOMBRE_MANIFIESTO)
+
+def ast_al_dia(path: str, huella: str) -> bool:
+    """
+    True si el arbol.ast junto a 'path' se generó desde una fuente con la
+    misma huella y no fue modificado (tamaño y mtime) desde entonces.
+    """
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            text = f.read()
-    except Exception as e:
-        print(f"No se pudo leer '{path}': {e}", file=sys.stderr)
-        return 1
+        with open(_ruta_manifiesto(path), 'r', encoding='utf-8') as f:
+            manifiesto = json.load(f)
+        st = Path(path).with_name('arbol.ast').stat()
+    except (OSError, ValueError):
+        return False
+    return (isinstance(manifiesto, dict)
+            and manifiesto.get('fuente') == Path(path).name
+            and manifiesto.get('huella') == huella
+            and manifiesto.get('ast_tamano') == st.st_size
+            and manifiesto.get('ast_mtime_ns') == st.st_mtime_ns)
+
+def guardar_manifiesto(path: str, huella: str) -> None:
+    """Registra la huella de 'path' y el estado del arbol.ast recién escrito"""
+    st = Path(path).with_name('arbol.ast').stat()
+    manifiesto = {
+        'version': VERSION_ANALIZADOR,
+        'fuente': Path(path).name,
+        'huella': huella,
+        'ast_tamano': st.st_size,
+        'ast_mtime_ns': st.st_mtime_ns,
+    }
+    with open(_ruta_manifiesto(path), 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+
+# --------------------
+# CLI
+# --------------------
+
+def escribir_ast(ast: Dict[str, Any], out_path: Union[str, Path]) -> None:
+    """Escribe el AST como JSON indentado (el formato de 'arbol.ast')"""
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(ast, f, ensure_ascii=False, indent=2, default=json_default)
+
+class _FalloArchivo(Exception):
+    """Fallo al procesar un archivo; el mensaje es el que muestra la CLI"""
+    pass
+
+def analizar_archivo(path: str, stream: bool = False, cache: bool = False,
+                     escribir: bool = True, empaquetar: bool = False) -> tuple:
+    """
+    Analiza un .brik y (si 'escribir') guarda 'arbol.ast' junto a él.
+
+    Retorna (estado, ast) con estado 'actualizado', 'sin_cambios' (modo
+    cache, ast es None) o 'validado' (sin escribir). Lanza _FalloArchivo
+    con el mensaje de error ya formateado.
+    """
+    out_path = Path(path).with_name('arbol.ast')
+
+    huella = None
+    if cache and escribir:
+        try:
+            huella = huella_fuente(path, 'empaquetar' if empaquetar else '')
+        except OSError as e:
+            raise _FalloArchivo(f"No se pudo leer '{path}': {e}")
+        if ast_al_dia(path, huella):
+            return 'sin_cambios', None
+
+    text = None
+    if not stream:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except Exception as e:
+            raise _FalloArchivo(f"No se pudo leer '{path}': {e}")
 
     try:
-        lexer = Lexer(text)
-        parser = Parser(lexer)
-        ast = parser.parse()
+        if stream:
+            ast = analizar_flujo(path, empaquetar_matrices=empaquetar)
+        else:
+            ast = Parser(LexerRapido(text), empaquetar).parse()
+    except (OSError, UnicodeDecodeError) as e:
+        raise _FalloArchivo(f"No se pudo leer '{path}': {e}")
     except (LexerError, ParserError) as e:
-        print(f"Error de análisis: {e}", file=sys.stderr)
-        return 1
+        raise _FalloArchivo(f"Error de análisis: {e}")
+
+    if not escribir:
+        return 'validado', ast
 
     # Guardar siempre el AST en un archivo 'arbol.ast' junto al .brik
-    out_path = Path(path).with_name('arbol.ast')
     try:
-        with open(out_path, 'w', encoding='utf-8') as f:
-            json.dump(ast, f, ensure_ascii=False, indent=2)
+        escribir_ast(ast, out_path)
     except Exception as e:
-        print(f"No se pudo escribir '{out_path}': {e}", file=sys.stderr)
+        raise _FalloArchivo(f"No se pudo escribir '{out_path}': {e}")
+
+    if cache:
+        try:
+            guardar_manifiesto(path, huella)
+        except OSError as e:
+            print(f"No se pudo escribir el manifiesto de '{path}': {e}", file=sys.stderr)
+    return 'actualizado', ast
+
+# --------------------
+# Modo por lotes (-j N)
+# --------------------
+
+_COMODINES = set('*?[')
+
+def expandir_entradas(entradas: List[str]) -> List[str]:
+    """
+    Expande directorios (todos los .brik, recursivo) y patrones glob.
+    Las rutas simples se conservan aunque no existan, para reportar su error.
+    """
+    rutas: List[str] = []
+    for entrada in entradas:
+        if Path(entrada).is_dir():
+            rutas.extend(str(p) for p in sorted(Path(entrada).rglob('*.brik')))
+        elif _COMODINES & set(entrada):
+            for encontrada in sorted(glob.glob(entrada, recursive=True)):
+                if Path(encontrada).is_dir():
+                    rutas.extend(str(p) for p in sorted(Path(encontrada).rglob('*.brik')))
+                else:
+                    rutas.append(encontrada)
+        else:
+            rutas.append(entrada)
+    return list(dict.fromkeys(rutas))
+
+def _procesar_en_lote(tarea: tuple) -> tuple:
+    """Trabajo de un proceso del pool: (ruta, estado, mensaje de error)"""
+    path, stream, cache, escribir, empaquetar = tarea
+    try:
+        estado, _ = analizar_archivo(path, stream, cache, escribir, empaquetar)
+    except _FalloArchivo as e:
+        return path, 'error', str(e)
+    except Exception as e:
+        return path, 'error', f"Error inesperado: {type(e).__name__}: {e}"
+    return path, estado, None
+
+def analizar_lote(rutas: List[str], trabajos: int = 1, stream: bool = False,
+                  cache: bool = False, escribir: bool = True, empaquetar: bool = False) -> List[tuple]:
+    """
+    Procesa varios .brik (en un pool de 'trabajos' procesos si es > 1) y
+    retorna [(ruta, estado, mensaje_error)] en el mismo orden que 'rutas'.
+    """
+    resultados: Dict[str, tuple] = {}
+    tareas = []
+    if escribir:
+        # Todos los .brik de un directorio escribirían el mismo arbol.ast
+        destinos: Dict[Path, List[str]] = {}
+        for path in rutas:
+            destinos.setdefault(Path(path).resolve().with_name('arbol.ast'), []).append(path)
+        for destino, grupo in destinos.items():
+            if len(grupo) > 1:
+                for path in grupo:
+                    resultados[path] = (path, 'error', f"Varios .brik escriben el mismo '{destino}' (usar --validar)")
+    for path in rutas:
+        if path not in resultados:
+            tareas.append((path, stream, cache, escribir, empaquetar))
+
+    if trabajos > 1 and len(tareas) > 1:
+        with ProcessPoolExecutor(max_workers=trabajos) as pool:
+            lote = max(1, len(tareas) // (trabajos * 4))
+            for res in pool.map(_procesar_en_lote, tareas, chunksize=lote):
+                resultados[res[0]] = res
+    else:
+        for tarea in tareas:
+            res = _procesar_en_lote(tarea)
+            resultados[res[0]] = res
+    return [resultados[path] for path in rutas]
+
+_ETIQUETAS_LOTE = {
+    'actualizado': 'actualizado(s)',
+    'validado': 'válido(s)',
+    'sin_cambios': 'sin cambios',
+    'error': 'con error',
+}
+
+def _leer_argumentos(argv: List[str]) -> tuple:
+    """
+    Separa banderas, '-j N' y rutas de la línea de comandos
+
+    '-j' exige un número: sin él (o seguido de una ruta) lanza ValueError,
+    para que un '-j' suelto no ocupe todos los núcleos sin avisar.
+    """
+    entradas: List[str] = []
+    banderas = set()
+    trabajos = None
+    args = iter(argv[1:])
+    for arg in args:
+        if arg == '-j':
+            trabajos = int(next(args, ''))
+        elif arg.startswith('-j') and arg[2:].isdigit():
+            trabajos = int(arg[2:])
+        elif arg.startswith('--'):
+            banderas.add(arg)
+        else:
+            entradas.append(arg)
+    return entradas, banderas, trabajos
+
+def main(argv: List[str]) -> int:
+    uso = "Uso: python analizador.py archivo.brik|directorio|patrón... [-j N] [--pretty] [--stream] [--cache] [--validar] [--empaquetar]"
+    try:
+        entradas, banderas, trabajos = _leer_argumentos(argv)
+    except ValueError:
+        print(uso, file=sys.stderr)
+        return 2
+    if not entradas:
+        print(uso, file=sys.stderr)
+        return 2
+    pretty = '--pretty' in banderas
+    stream = '--stream' in banderas
+    cache = '--cache' in banderas
+    escribir = '--validar' not in banderas
+    empaquetar = '--empaquetar' in banderas
+
+    lote = (trabajos is not None or len(entradas) > 1
+            or any(Path(e).is_dir() or _COMODINES & set(e) for e in entradas))
+    if lote:
+        rutas = expandir_entradas(entradas)
+        if trabajos == 0:
+            trabajos = os.cpu_count() or 1
+            print(f"-j 0: usando {trabajos} proceso(s)")
+        elif trabajos is None or trabajos < 1:
+            trabajos = 1
+        resultados = analizar_lote(rutas, trabajos, stream, cache, escribir, empaquetar)
+        conteo: Dict[str, int] = {}
+        for path, estado, error in resultados:
+            conteo[estado] = conteo.get(estado, 0) + 1
+            if error:
+                print(f"{path}: {error}", file=sys.stderr)
+        detalle = ', '.join(f"{conteo[estado]} {etiqueta}" for estado, etiqueta in _ETIQUETAS_LOTE.items()
+                            if estado in conteo)
+        print(f"Resumen: {len(resultados)} archivo(s){': ' + detalle if detalle else ''}")
+        return 1 if conteo.get('error') or not resultados else 0
+
+    path = entradas[0]
+    try:
+        estado, ast = analizar_archivo(path, stream, cache, escribir, empaquetar)
+    except _FalloArchivo as e:
+        print(e, file=sys.stderr)
         return 1
 
+    if cache and escribir:
+        out_path = Path(path).with_name('arbol.ast')
+        print(f"{'Sin cambios' if estado == 'sin_cambios' else 'Actualizado'}: {out_path}")
+        return 0
+
     if pretty:
-        print(json.dumps(ast, ensure_ascii=False, indent=2))
+        print(json.dumps(ast, ensure_ascii=False, indent=2, default=json_default))
     else:
-        print(json.dumps(ast, ensure_ascii=False, separators=(',', ':')))
+        print(json.dumps(ast, ensure_ascii=False, separators=(',', ':'), default=json_default))
     return 0
 
 if __name__ == '__main__':
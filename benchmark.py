@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+benchmark.py
+Benchmark del Lexer/Parser de analizador.py sobre documentos .brik sintéticos.
+
+Genera documentos con la misma forma que snake.brik y tetris.brik (bloques de
+parámetros, reglas, piezas con matrices, manzanas anidadas, eventos con '->'
+y controles) y mide, para cada tamaño:
+- lexer:  tokens/s, MB/s y memoria pico (LexerRapido)
+- parser: tokens/s, MB/s y memoria pico (incluye el lexeo con LexerRapido)
+- lexer_original / parser_original: lo mismo con el Lexer carácter a
+  carácter, en la misma corrida y sobre el mismo texto, para ver la
+  aceleración de LexerRapido (se omiten con --sin-original)
+- json:   MB/s de salida y memoria pico de json.dumps(indent=2)
+
+Los resultados pueden guardarse como línea base y compararse en corridas
+posteriores; una caída de rendimiento o un aumento de memoria mayor que la
+tolerancia se reporta como regresión (código de salida 1).
+
+Uso:
+    python benchmark.py
+    python benchmark.py --tamanos 64K,1M,16M --profundidad 3 --comentarios 0.5 --matriz 8 --mapeos 20
+    python benchmark.py --guardar-base
+    python benchmark.py --sin-original   (solo LexerRapido, para tamaños grandes)
+    python benchmark.py --base benchmark_base.json --tolerancia 0.15
+    python benchmark.py --generar nivel.brik --tamanos 200M   (solo escribe el documento)
+"""
+from __future__ import annotations
+
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import analizador
+
+BASE_POR_DEFECTO = 'benchmark_base.json'
+
+COLORES = ["rojo", "verde", "azul", "amarillo", "cyan", "morado", "naranja", "dorado", "rosa", "gris"]
+TECLAS = ["A", "D", "S", "W", "J", "K", "P", "Q", "R", "Espacio"]
+
+# --------------------
+# Generador de documentos
+# --------------------
+
+def _tamano_en_bytes(texto: str) -> int:
+    """'64K', '1M', '2G' o un entero -> bytes"""
+    texto = texto.strip().upper()
+    mult = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}.get(texto[-1:], 1)
+    return int(float(texto.rstrip('KMG')) * mult)
+
+def _comentario(rng: random.Random, densidad: float, sangria: str) -> str:
+    if rng.random() >= densidad:
+        return ''
+    if rng.random() < 0.7:
+        return f"{sangria}// comentario {rng.randint(0, 9999)}\n"
+    return f"{sangria}/* bloque de comentario\n{sangria}   con varias líneas {rng.randint(0, 9999)} */\n"
+
+def _matriz(rng: random.Random, n: int) -> str:
+    filas = (", ".join(str(rng.randint(0, 1)) for _ in range(n)) for _ in range(n))
+    return "[" + ", ".join(f"[{f}]" for f in filas) + "]"
+
+def _anidado(rng: random.Random, nivel: int, profundidad: int, densidad: float, sangria: str) -> str:
+    if nivel > profundidad:
+        return f'{sangria}valor = {rng.randint(-100, 100)},\n'
+    interior = _anidado(rng, nivel + 1, profundidad, densidad, sangria + "    ")
+    return (f"{sangria}capa_{nivel} {{\n"
+            f"{_comentario(rng, densidad, sangria + '    ')}"
+            f'{sangria}    color = "{rng.choice(COLORES)}",\n'
+            f"{sangria}    peso = {rng.random():.3f},\n"
+            f"{interior}"
+            f"{sangria}}},\n")
+
+def _unidad(rng: random.Random, i: int, profundidad: int, densidad: float, tam_matriz: int, mapeos: int) -> str:
+    """Un bloque de nivel superior con la forma de snake.brik/tetris.brik"""
+    c = lambda s: _comentario(rng, densidad, s)
+    partes = [
+        c(""),
+        f"nivel_{i} {{\n",
+        c("    "),
+        f'    mi_juego = "Nivel {i}",\n',
+        f"    cuadricula = [{rng.randint(10, 200)}, {rng.randint(10, 200)}],\n",
+        f"    celda = {rng.choice([8, 10, 16])},\n",
+        "    reglas {\n",
+        c("        "),
+        f"        vidas_iniciales = {rng.randint(1, 5)},\n",
+        f"        tick_base = {rng.random():.2f},\n",
+        f"        hard_drop = {rng.choice(['true', 'false'])}\n",
+        "    },\n",
+        "    piezas {\n",
+    ]
+    for p in range(3):
+        partes.append(f'        P{p} {{ color = "{rng.choice(COLORES)}", matriz = {_matriz(rng, tam_matriz)} }},\n')
+        partes.append(c("        "))
+    partes.append("    },\n")
+    partes.append(_anidado(rng, 1, profundidad, densidad, "    "))
+    partes.append("    eventos {\n")
+    for m in range(mapeos):
+        partes.append(f"        evento_{m} -> accion_{rng.randint(0, 50)},\n")
+    partes.append("    },\n")
+    partes.append("    controles {\n")
+    for t in range(3):
+        partes.append(f'        tecla_{t} = "{rng.choice(TECLAS)}",\n')
+    partes.append("    }\n")
+    partes.append("}\n\n")
+    return ''.join(partes)
+
+def generar_brik(tamano: int, profundidad: int = 2, comentarios: float = 0.2,
+                 matriz: int = 4, mapeos: int = 8, semilla: int = 0) -> Iterator[str]:
+    """Genera por partes un documento .brik de aproximadamente 'tamano' bytes"""
+    rng = random.Random(semilla)
+    total = 0
+    i = 0
+    while total < tamano:
+        unidad = _unidad(rng, i, profundidad, comentarios, matriz, mapeos)
+        total += len(unidad.encode('utf-8'))
+        i += 1
+        yield unidad
+
+# --------------------
+# Mediciones
+# --------------------
+
+def _contar_tokens(texto: str, clase: type = analizador.LexerRapido) -> int:
+    lexer = clase(texto)
+    n = 0
+    while lexer.next().type != 'EOF':
+        n += 1
+    return n
+
+def _mejor_tiempo(fn: Callable[[], Any], repeticiones: int) -> float:
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+def _memoria_pico(fn: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def medir(texto: str, repeticiones: int = 3, memoria: bool = True,
+          original: bool = True) -> Dict[str, Dict[str, float]]:
+    """Mide lexer, parser y emisión JSON sobre 'texto' (y el Lexer original si 'original')"""
+    mb_entrada = len(texto.encode('utf-8')) / 1e6
+    tokens = _contar_tokens(texto)
+    ast = analizador.Parser(analizador.LexerRapido(texto)).parse()
+    salida = json.dumps(ast, ensure_ascii=False, indent=2)
+    mb_salida = len(salida.encode('utf-8')) / 1e6
+    del salida
+
+    fases = {
+        'lexer': (lambda: _contar_tokens(texto), mb_entrada, tokens),
+        'parser': (lambda: analizador.Parser(analizador.LexerRapido(texto)).parse(), mb_entrada, tokens),
+    }
+    if original:
+        fases['lexer_original'] = (lambda: _contar_tokens(texto, analizador.Lexer), mb_entrada, tokens)
+        fases['parser_original'] = (lambda: analizador.Parser(analizador.Lexer(texto)).parse(), mb_entrada, tokens)
+    fases['json'] = (lambda: json.dumps(ast, ensure_ascii=False, indent=2), mb_salida, None)
+    resultados: Dict[str, Dict[str, float]] = {}
+    for fase, (fn, mb, ntok) in fases.items():
+        t = _mejor_tiempo(fn, repeticiones)
+        r = {'segundos': t, 'mb_s': mb / t}
+        if ntok is not None:
+            r['tokens_s'] = ntok / t
+        if memoria:
+            r['pico_mb'] = _memoria_pico(fn) / 1e6
+        resultados[fase] = r
+    return resultados
+
+# --------------------
+# Línea base
+# --------------------
+
+def comparar(actual: Dict[str, Any], base: Dict[str, Any], tolerancia: float) -> List[str]:
+    """Lista de regresiones de 'actual' respecto a 'base'"""
+    regresiones = []
+    for caso, fases in actual['casos'].items():
+        for fase, r in fases.items():
+            b = base.get('casos', {}).get(caso, {}).get(fase)
+            if not b:
+                continue
+            for metrica in ('tokens_s', 'mb_s'):
+                if metrica in r and metrica in b and r[metrica] < b[metrica] * (1 - tolerancia):
+                    regresiones.append(f"{caso}/{fase}: {metrica} {r[metrica]:,.2f} < base {b[metrica]:,.2f}")
+            if 'pico_mb' in r and 'pico_mb' in b and r['pico_mb'] > b['pico_mb'] * (1 + tolerancia):
+                regresiones.append(f"{caso}/{fase}: pico_mb {r['pico_mb']:.1f} > base {b['pico_mb']:.1f}")
+    return regresiones
+
+# --------------------
+# CLI
+# --------------------
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark del Lexer/Parser .brik")
+    ap.add_argument('--tamanos', default='64K,1M,8M', help="tamaños separados por coma (K, M, G)")
+    ap.add_argument('--profundidad', type=int, default=2, help="niveles de bloques anidados")
+    ap.add_argument('--comentarios', type=float, default=0.2, help="probabilidad de comentario por entrada (0-1)")
+    ap.add_argument('--matriz', type=int, default=4, help="lado de las matrices de piezas")
+    ap.add_argument('--mapeos', type=int, default=8, help="mapeos '->' por bloque de eventos")
+    ap.add_argument('--semilla', type=int, default=0)
+    ap.add_argument('--repeticiones', type=int, default=3)
+    ap.add_argument('--sin-memoria', action='store_true', help="no medir memoria pico (tracemalloc es lento)")
+    ap.add_argument('--sin-original', action='store_true', help="no medir el Lexer original (lento en tamaños grandes)")
+    ap.add_argument('--base', default=BASE_POR_DEFECTO, help="archivo de línea base")
+    ap.add_argument('--guardar-base', action='store_true', help="guardar los resultados como línea base")
+    ap.add_argument('--tolerancia', type=float, default=0.15)
+    ap.add_argument('--generar', metavar='ARCHIVO', help="solo escribe el documento sintético (primer tamaño)")
+    args = ap.parse_args(argv)
+
+    tamanos = [_tamano_en_bytes(t) for t in args.tamanos.split(',') if t.strip()]
+    params = {
+        'profundidad': args.profundidad,
+        'comentarios': args.comentarios,
+        'matriz': args.matriz,
+        'mapeos': args.mapeos,
+        'semilla': args.semilla,
+    }
+
+    if args.generar:
+        with open(args.generar, 'w', encoding='utf-8') as f:
+            for parte in generar_brik(tamanos[0], **params):
+                f.write(parte)
+        print(f"Documento generado: {args.generar}")
+        return 0
+
+    actual: Dict[str, Any] = {'version': analizador.VERSION_ANALIZADOR, 'parametros': params, 'casos': {}}
+    print(f"{'caso':>10} {'fase':>15} {'tokens/s':>14} {'MB/s':>9} {'pico MB':>9}")
+    for tamano in tamanos:
+        texto = ''.join(generar_brik(tamano, **params))
+        caso = f"{tamano // 1024}K"
+        fases = medir(texto, args.repeticiones, not args.sin_memoria, not args.sin_original)
+        actual['casos'][caso] = fases
+        for fase, r in fases.items():
+            tok = f"{r['tokens_s']:,.0f}" if 'tokens_s' in r else '-'
+            pico = f"{r['pico_mb']:.1f}" if 'pico_mb' in r else '-'
+            print(f"{caso:>10} {fase:>15} {tok:>14} {r['mb_s']:>9.2f} {pico:>9}")
+        for fase in ('lexer', 'parser'):
+            if f'{fase}_original' in fases:
+                aceleracion = fases[f'{fase}_original']['segundos'] / fases[fase]['segundos']
+                print(f"{caso:>10} {fase:>15} x{aceleracion:.1f} más rápido que con el Lexer original")
+        del texto
+
+    if args.guardar_base:
+        with open(args.base, 'w', encoding='utf-8') as f:
+            json.dump(actual, f, ensure_ascii=False, indent=2)
+        print(f"Línea base guardada en {args.base}")
+        return 0
+
+    if not Path(args.base).exists():
+        return 0
+    with open(args.base, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    if base.get('parametros') != params:
+        print(f"Aviso: la línea base {args.base} usa otros parámetros de generación", file=sys.stderr)
+    regresiones = comparar(actual, base, args.tolerancia)
+    for r in regresiones:
+        print(f"REGRESIÓN {r}", file=sys.stderr)
+    if not regresiones:
+        print(f"Sin regresiones respecto a {args.base} (tolerancia {args.tolerancia:.0%})")
+    return 1 if regresiones else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,8 +4,11 @@ Desarrollado para el proyecto PP_TLP
 """
 
 from .nucleo import Motor
-from .graficos import Graficos
+from .graficos import Graficos, Camara
 from .entrada import ControladorEntrada
-from .interprete import InterpreteAST
+from .interprete import InterpreteAST, RegistroAST, registro_ast
+from .recarga import RecargadorBrik
+from .estados import BufferTriple
+from .grabacion import GrabadorFrames, leer_grabacion, frame_a_superficie
 
-__all__ = ['Motor', 'Graficos', 'ControladorEntrada', 'InterpreteAST']
\ No newline at end of file
+__all__ = ['Motor', 'Graficos', 'Camara', 'ControladorEntrada', 'InterpreteAST', 'RegistroAST', 'registro_ast', 'RecargadorBrik', 'GrabadorFrames', 'leer_grabacion', 'frame_a_superficie', 'BufferTriple']
\ No newline at end of file
@@ -0,0 +1,48 @@
+"""
+Intercambio de estado entre hilos - El hilo de lógica publica instantáneas
+inmutables del juego y el render siempre toma la última completa
+"""
+import threading
+from typing import Any, Optional
+
+
+class BufferTriple:
+    """
+    Triple buffer de un productor (hilo de lógica) y un consumidor (render)
+
+    El productor guarda cada instantánea en su buffer trasero y al publicar
+    lo intercambia con el del medio; el consumidor, al leer, se queda con el
+    del medio si llegó uno nuevo. Ninguno espera al otro más que el
+    intercambio de dos índices: una lógica lenta no frena el render, un
+    render lento no frena la lógica, y el render nunca ve un estado a medio
+    escribir. Las instantáneas deben ser inmutables (p.ej. NamedTuple de
+    tuplas): el productor no vuelve a tocar lo que publicó.
+    """
+
+    def __init__(self, inicial: Optional[Any] = None):
+        self._buffers = [inicial, inicial, inicial]
+        self._trasero, self._medio, self._frente = 0, 1, 2
+        self._nuevo = False
+        self._lock = threading.Lock()
+        self.publicados = 0
+        self.leidos = 0
+
+    def publicar(self, valor: Any):
+        """Productor: deja 'valor' como el último estado completo"""
+        self._buffers[self._trasero] = valor
+        with self._lock:
+            self._trasero, self._medio = self._medio, self._trasero
+            self._nuevo = True
+        self.publicados += 1
+
+    def leer(self) -> Any:
+        """Consumidor: el último estado publicado (el mismo que antes si no hay nuevo)"""
+        with self._lock:
+            if self._nuevo:
+                self._frente, self._medio = self._medio, self._frente
+                self._nuevo = False
+                self.leidos += 1
+        return self._buffers[self._frente]
+
+    def __repr__(self) -> str:
+        return f"BufferTriple({self.publicados} publicados, {self.leidos} leídos)"
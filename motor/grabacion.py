@@ -0,0 +1,198 @@
+"""
+Grabación de partidas - Copia cada frame presentado a un anillo de buffers
+preasignados y un hilo de fondo los escribe a disco
+"""
+import queue
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+import pygame
+
+
+# Encabezado: firma, ancho, alto, pitch (bytes por fila), bytes por píxel,
+# máscaras R/G/B y compresión (0 = crudo, 1 = zlib)
+_ENCABEZADO = struct.Struct("<8sIIIIIIIB")
+_FIRMA = b"BRIKFRM1"
+# Antes de cada frame: número de frame, segundos desde el inicio, largo de los datos
+_CABECERA_FRAME = struct.Struct("<IdI")
+
+POLITICAS = ("descartar", "bloquear")
+
+
+class GrabadorFrames:
+    """
+    Grabador de frames con cola acotada
+
+    capturar() se llama en el game loop justo después de presentar el frame:
+    solo copia los bytes de la superficie (memoryview sin copia intermedia)
+    a un buffer libre del anillo y lo encola. El hilo escritor vacía la cola
+    al archivo, comprimiendo con zlib si se pidió, y devuelve el buffer.
+
+    Si no hay buffer libre (el disco no da abasto), la política decide:
+    'descartar' pierde el frame y lo cuenta; 'bloquear' espera a que el
+    escritor libere uno (el juego se frena, pero no se pierde nada).
+    """
+
+    def __init__(self, ruta: str, superficie: pygame.Surface, capacidad: int = 8,
+                 politica: str = "descartar", comprimir: bool = False):
+        """
+        Args:
+            ruta: Archivo de salida (ver leer_grabacion)
+            superficie: Superficie que se graba (la pantalla del motor)
+            capacidad: Cantidad de buffers del anillo
+            politica: 'descartar' o 'bloquear' cuando el anillo está lleno
+            comprimir: Comprimir cada frame con zlib (nivel 1)
+        """
+        if politica not in POLITICAS:
+            raise ValueError(f"Política de grabación desconocida: {politica!r} (usar {', '.join(POLITICAS)})")
+        if capacidad < 1:
+            raise ValueError("La capacidad del anillo debe ser al menos 1")
+        self.ruta = Path(ruta)
+        self.politica = politica
+        self.comprimir = comprimir
+        self.tam_frame = superficie.get_pitch() * superficie.get_height()
+        self._buffers = [bytearray(self.tam_frame) for _ in range(capacidad)]
+        self._libres: "queue.Queue[int]" = queue.Queue()
+        for i in range(capacidad):
+            self._libres.put(i)
+        self._llenos: "queue.Queue[Optional[Tuple[int, int, float]]]" = queue.Queue()
+
+        # Estadísticas
+        self.capturados = 0
+        self.descartados = 0
+        self.escritos = 0
+        self.bytes_escritos = 0
+        self.tiempo_captura = 0.0  # segundos gastados en capturar() (incluye esperas)
+        self.error: Optional[Exception] = None
+
+        self._archivo = open(self.ruta, "wb")
+        r, g, b, _ = superficie.get_masks()
+        self._archivo.write(_ENCABEZADO.pack(
+            _FIRMA, superficie.get_width(), superficie.get_height(), superficie.get_pitch(),
+            superficie.get_bytesize(), r, g, b, 1 if comprimir else 0))
+        self._inicio = time.perf_counter()
+        self._hilo = threading.Thread(target=self._escribir, name=f"grabacion-{self.ruta.name}", daemon=True)
+        self._hilo.start()
+
+    def capturar(self, superficie: pygame.Surface, numero: int):
+        """Copia el frame actual de 'superficie' a un buffer libre y lo encola"""
+        t0 = time.perf_counter()
+        try:
+            slot = self._libres.get_nowait()
+        except queue.Empty:
+            if self.politica == "descartar" or self.error is not None:
+                self.descartados += 1
+                self.tiempo_captura += time.perf_counter() - t0
+                return
+            slot = self._libres.get()
+
+        vista = memoryview(superficie.get_view("0"))
+        try:
+            self._buffers[slot][:] = vista
+        finally:
+            vista.release()
+        self._llenos.put((slot, numero, t0 - self._inicio))
+        self.capturados += 1
+        self.tiempo_captura += time.perf_counter() - t0
+
+    def _escribir(self):
+        """Hilo escritor: vacía la cola al archivo hasta recibir None"""
+        while True:
+            item = self._llenos.get()
+            if item is None:
+                return
+            slot, numero, t = item
+            try:
+                if self.error is None:
+                    datos = self._buffers[slot]
+                    if self.comprimir:
+                        datos = zlib.compress(datos, 1)
+                    self._archivo.write(_CABECERA_FRAME.pack(numero, t, len(datos)))
+                    self._archivo.write(datos)
+                    self.escritos += 1
+                    self.bytes_escritos += _CABECERA_FRAME.size + len(datos)
+            except OSError as e:
+                # Disco lleno, etc.: se deja de escribir pero el juego sigue
+                self.error = e
+            finally:
+                self._libres.put(slot)
+
+    def cerrar(self):
+        """Espera a que se escriban los frames encolados y cierra el archivo"""
+        if self._hilo is None:
+            return
+        self._llenos.put(None)
+        self._hilo.join()
+        self._hilo = None
+        self._archivo.close()
+
+    def costo_medio_ms(self) -> float:
+        """Milisegundos que capturar() le cuesta en promedio a cada frame"""
+        total = self.capturados + self.descartados
+        return self.tiempo_captura * 1000 / total if total else 0.0
+
+    def estadisticas(self) -> Dict[str, float]:
+        """Contadores de la grabación (frames capturados, descartados, escritos...)"""
+        return {
+            "capturados": self.capturados,
+            "descartados": self.descartados,
+            "escritos": self.escritos,
+            "en_cola": self._llenos.qsize(),
+            "bytes_escritos": self.bytes_escritos,
+            "costo_medio_ms": self.costo_medio_ms(),
+        }
+
+    def __repr__(self) -> str:
+        return (f"GrabadorFrames({self.ruta}, {self.capturados} capturados, "
+                f"{self.descartados} descartados, {self.costo_medio_ms():.3f} ms/frame)")
+
+
+def leer_grabacion(ruta: str) -> Tuple[Dict[str, int], Iterator[Tuple[int, float, bytes]]]:
+    """
+    Abre un archivo escrito por GrabadorFrames
+
+    Retorna (encabezado, frames): el encabezado tiene ancho, alto, pitch,
+    bytes_por_pixel, mascaras y comprimido; frames itera (número, segundos,
+    bytes crudos del frame), ya descomprimidos. Cada frame se vuelve a
+    imagen con frame_a_superficie().
+    """
+    archivo = open(ruta, "rb")
+    firma, ancho, alto, pitch, bpp, r, g, b, comprimido = _ENCABEZADO.unpack(archivo.read(_ENCABEZADO.size))
+    if firma != _FIRMA:
+        archivo.close()
+        raise ValueError(f"{ruta} no es una grabación de frames")
+    encabezado = {"ancho": ancho, "alto": alto, "pitch": pitch, "bytes_por_pixel": bpp,
+                  "mascaras": (r, g, b), "comprimido": comprimido}
+
+    def frames():
+        with archivo:
+            while True:
+                cabecera = archivo.read(_CABECERA_FRAME.size)
+                if len(cabecera) < _CABECERA_FRAME.size:
+                    return
+                numero, t, largo = _CABECERA_FRAME.unpack(cabecera)
+                datos = archivo.read(largo)
+                yield numero, t, zlib.decompress(datos) if comprimido else datos
+
+    return encabezado, frames()
+
+
+def frame_a_superficie(encabezado: Dict[str, int], datos: bytes) -> pygame.Surface:
+    """Surface con el frame 'datos' de una grabación (p.ej. para pygame.image.save)"""
+    ancho, alto, pitch = encabezado["ancho"], encabezado["alto"], encabezado["pitch"]
+    superficie = pygame.Surface((ancho, alto), 0, encabezado["bytes_por_pixel"] * 8,
+                                (*encabezado["mascaras"], 0))
+    destino = superficie.get_buffer()
+    paso = superficie.get_pitch()
+    if paso == pitch:
+        destino.write(bytes(datos))
+    else:
+        fila = ancho * encabezado["bytes_por_pixel"]
+        for y in range(alto):
+            destino.write(bytes(datos[y * pitch:y * pitch + fila]), y * paso)
+    del destino
+    return superficie
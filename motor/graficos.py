@@ -3,7 +3,72 @@ Funciones gráficas básicas del motor
 Requisito: dibujar_ladrillo(), dibujar_texto(), etc.
 """
 import pygame
-from typing import Tuple
+from collections import OrderedDict
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from analizador import MatrizEmpaquetada
+
+
+class Camara:
+    """
+    Vista de un mundo (tablero) más grande que la ventana: qué zona del
+    mundo se ve (x, y en píxeles del mundo) y en qué rectángulo de la
+    pantalla (vista)
+    """
+    
+    def __init__(self, ancho_vista: int, alto_vista: int, ancho_mundo: int, alto_mundo: int,
+                 x_pantalla: int = 0, y_pantalla: int = 0):
+        """
+        Args:
+            ancho_vista: Ancho en píxeles de la zona de pantalla donde se ve el mundo
+            alto_vista: Alto en píxeles de esa zona
+            ancho_mundo: Ancho del mundo en píxeles
+            alto_mundo: Alto del mundo en píxeles
+            x_pantalla: Esquina de la vista en la pantalla
+            y_pantalla: Esquina de la vista en la pantalla
+        """
+        self.vista = pygame.Rect(x_pantalla, y_pantalla, ancho_vista, alto_vista)
+        self.ancho_mundo = ancho_mundo
+        self.alto_mundo = alto_mundo
+        self.x = 0
+        self.y = 0
+        # Cambia cada vez que la cámara se mueve (para invalidar fondos en caché)
+        self.version = 0
+    
+    def mover_a(self, x: float, y: float):
+        """Ubica la esquina superior izquierda de la vista en (x, y) del mundo, sin salirse de él"""
+        x = max(0, min(int(x), self.ancho_mundo - self.vista.w))
+        y = max(0, min(int(y), self.alto_mundo - self.vista.h))
+        if x != self.x or y != self.y:
+            self.x, self.y = x, y
+            self.version += 1
+    
+    def seguir(self, x: float, y: float):
+        """Centra la vista en el punto (x, y) del mundo, en píxeles"""
+        self.mover_a(x - self.vista.w // 2, y - self.vista.h // 2)
+    
+    def recortar(self, x: int, y: int, ancho: int, alto: int) -> Optional[tuple]:
+        """
+        Lleva un rectángulo del mundo a la pantalla
+        
+        Retorna None si queda fuera de la vista; si no (x, y, area) en
+        pantalla, donde area es la parte visible (relativa al rectángulo)
+        cuando está cortado por el borde de la vista, o None si se ve entero.
+        """
+        v = self.vista
+        sx = x - self.x + v.x
+        sy = y - self.y + v.y
+        if sx >= v.right or sy >= v.bottom or sx + ancho <= v.x or sy + alto <= v.y:
+            return None
+        if sx >= v.x and sy >= v.y and sx + ancho <= v.right and sy + alto <= v.bottom:
+            return sx, sy, None
+        r = pygame.Rect(sx, sy, ancho, alto).clip(v)
+        return r.x, r.y, (r.x - sx, r.y - sy, r.w, r.h)
+    
+    def __repr__(self) -> str:
+        return f"Camara(({self.x}, {self.y}) {self.vista.w}x{self.vista.h} de {self.ancho_mundo}x{self.alto_mundo})"
+
 
 class Graficos:
     """Maneja todas las operaciones de dibujo del motor"""
@@ -26,6 +91,9 @@ class Graficos:
         "gris_oscuro": (50, 50, 50)
     }
     
+    # Máximo de textos rasterizados que se guardan en caché (LRU)
+    TAM_CACHE_TEXTO = 256
+    
     def __init__(self, pantalla: pygame.Surface, tam_celda: int = 10):
         """
         Inicializa el sistema gráfico
@@ -38,11 +106,121 @@ class Graficos:
         self.tam_celda = tam_celda
         self.fuente = pygame.font.Font(None, 36)
         self.fuente_pequeña = pygame.font.Font(None, 24)
+        
+        # (texto, fuente, rgb) -> superficie ya rasterizada
+        self._cache_texto: "OrderedDict[tuple, pygame.Surface]" = OrderedDict()
+        # Etiquetas del HUD: nombre -> ((texto, fuente, rgb), superficie)
+        self._etiquetas: Dict[str, tuple] = {}
+        # Atlas de ladrillos: (color, forma, tam_celda) -> superficie pre-renderizada
+        self._sprites: Dict[tuple, pygame.Surface] = {}
+        # Grillas por índices: paleta, y por nombre (clave, lienzo escalado) reutilizados entre frames
+        self._paleta_indices: Optional[tuple] = None
+        self._lienzos_indices: Dict[str, tuple] = {}
+        # Cuadrícula pre-renderizada: ((ancho, alto, tam_celda, color, opacidad), superficie)
+        self._cuadricula: Optional[tuple] = None
+        
+        # Cámara (None = el mundo se dibuja tal cual desde la esquina de la pantalla)
+        self.camara: Optional[Camara] = None
+        self._version_camara = None
+        
+        # Modo de rectángulos sucios (ver activar_rects_sucios)
+        self.modo_sucio = False
+        self._fondo: Optional[pygame.Surface] = None
+        self._color_fondo: Optional[Tuple[int, int, int]] = None
+        self._ops: List[tuple] = []
+        self._rects: List[pygame.Rect] = []
+        self._ops_previas: List[tuple] = []
+        self._rects_previos: List[pygame.Rect] = []
+        self._marcados: List[pygame.Rect] = []
+        self._todo_sucio = False
+        self.precargar_sprites()
     
     def obtener_color(self, nombre_color: str) -> Tuple[int, int, int]:
         """Convierte un nombre de color a tupla RGB"""
         return self.COLORES.get(nombre_color.lower(), (255, 255, 255))
     
+    def _crear_sprite(self, color: str, forma: str) -> pygame.Surface:
+        """Pre-renderiza un ladrillo de una celda, en el formato de la pantalla"""
+        tam = self.tam_celda
+        rgb = self.obtener_color(color)
+        
+        if forma == "circulo":
+            sprite = pygame.Surface((tam, tam), pygame.SRCALPHA)
+            centro = (tam // 2, tam // 2)
+            radio = tam // 2 - 1
+            pygame.draw.circle(sprite, rgb, centro, radio)
+            # Borde para mejor visibilidad
+            pygame.draw.circle(sprite, (0, 0, 0), centro, radio, 1)
+            convertir = sprite.convert_alpha
+        else:  # cuadro por defecto
+            sprite = pygame.Surface((tam, tam))
+            rect = sprite.get_rect()
+            pygame.draw.rect(sprite, rgb, rect)
+            # Borde más sutil
+            borde_color = tuple(max(0, c - 40) for c in rgb)
+            pygame.draw.rect(sprite, borde_color, rect, 1)
+            convertir = sprite.convert
+        
+        if pygame.display.get_surface() is not None:
+            sprite = convertir()
+        return sprite
+    
+    def sprite_ladrillo(self, color: str, forma: str = "cuadro") -> pygame.Surface:
+        """Superficie del ladrillo (color, forma) desde el atlas, creándola si falta"""
+        clave = (color, forma, self.tam_celda)
+        sprite = self._sprites.get(clave)
+        if sprite is None:
+            sprite = self._sprites[clave] = self._crear_sprite(color, forma)
+        return sprite
+    
+    def precargar_sprites(self, colores=None, formas=("cuadro", "circulo")):
+        """
+        Llena el atlas de ladrillos para los colores indicados (por defecto
+        toda la paleta) para no crear sprites durante el juego
+        """
+        for color in (self.COLORES if colores is None else colores):
+            for forma in formas:
+                self.sprite_ladrillo(color, forma)
+    
+    def usar_camara(self, ancho_vista: int, alto_vista: int, ancho_celdas: int, alto_celdas: int,
+                    x_pantalla: int = 0, y_pantalla: int = 0) -> Camara:
+        """
+        Activa una cámara para un tablero de ancho_celdas x alto_celdas que
+        se ve en un rectángulo de ancho_vista x alto_vista píxeles
+        
+        Desde entonces las funciones que reciben celdas (dibujar_ladrillo,
+        dibujar_ladrillos, dibujar_cuadricula, dibujar_indices) pasan por la
+        transformación de la vista y descartan lo que queda fuera antes de
+        dibujar; textos, rectángulos y capas siguen en píxeles de pantalla.
+        """
+        self.camara = Camara(ancho_vista, alto_vista, ancho_celdas * self.tam_celda,
+                             alto_celdas * self.tam_celda, x_pantalla, y_pantalla)
+        return self.camara
+    
+    def quitar_camara(self):
+        """Vuelve a dibujar el mundo sin transformación"""
+        self.camara = None
+    
+    def seguir_celda(self, x: int, y: int):
+        """Centra la cámara (si hay) en la celda (x, y), p.ej. la cabeza de la snake"""
+        if self.camara is not None:
+            t = self.tam_celda
+            self.camara.seguir(x * t + t // 2, y * t + t // 2)
+    
+    def celdas_visibles(self, ancho_celdas: int, alto_celdas: int) -> Tuple[int, int, int, int]:
+        """
+        Rango de celdas (x0, y0, x1, y1), con x1/y1 excluidos, que se ven con
+        la cámara actual; sin cámara, el tablero completo. Sirve para recorrer
+        solo la parte visible de un tablero grande.
+        """
+        if self.camara is None:
+            return 0, 0, ancho_celdas, alto_celdas
+        t = self.tam_celda
+        cam = self.camara
+        return (max(0, cam.x // t), max(0, cam.y // t),
+                min(ancho_celdas, -(-(cam.x + cam.vista.w) // t)),
+                min(alto_celdas, -(-(cam.y + cam.vista.h) // t)))
+    
     def dibujar_ladrillo(self, x: int, y: int, color: str, forma: str = "cuadro"):
         """
         Dibuja un ladrillo/bloque en la posición especificada
@@ -53,22 +231,196 @@ class Graficos:
             color: Nombre del color (string del DSL)
             forma: "cuadro" o "circulo"
         """
+        sprite = self._sprites.get((color, forma, self.tam_celda))
+        if sprite is None:
+            sprite = self.sprite_ladrillo(color, forma)
         px = x * self.tam_celda
         py = y * self.tam_celda
-        rgb = self.obtener_color(color)
+        area = None
+        if self.camara is not None:
+            visible = self.camara.recortar(px, py, self.tam_celda, self.tam_celda)
+            if visible is None:
+                return
+            px, py, area = visible
+        self._blit(sprite, px, py, area)
+    
+    def dibujar_ladrillos(self, ladrillos: Iterable[tuple], destino: Optional[pygame.Surface] = None):
+        """
+        Dibuja muchos ladrillos de una vez: resuelve los sprites del atlas y
+        hace una sola llamada por lotes (Surface.fblits si existe, si no
+        Surface.blits) en vez de un blit por celda
         
-        if forma == "circulo":
-            centro = (px + self.tam_celda // 2, py + self.tam_celda // 2)
-            radio = self.tam_celda // 2 - 1
-            pygame.draw.circle(self.pantalla, rgb, centro, radio)
-            # Borde para mejor visibilidad
-            pygame.draw.circle(self.pantalla, (0, 0, 0), centro, radio, 1)
-        else:  # cuadro por defecto
-            rect = pygame.Rect(px, py, self.tam_celda, self.tam_celda)
-            pygame.draw.rect(self.pantalla, rgb, rect)
-            # Borde más sutil
-            borde_color = tuple(max(0, c - 40) for c in rgb)
-            pygame.draw.rect(self.pantalla, borde_color, rect, 1)
+        Args:
+            ladrillos: Iterable de (x, y, color) o (x, y, color, forma), en celdas
+            destino: Superficie donde dibujar (p.ej. una capa de crear_capa());
+                por defecto la pantalla
+        """
+        t = self.tam_celda
+        sprites = self._sprites
+        camara = self.camara if destino is None else None
+        lote = []
+        for ladrillo in ladrillos:
+            px = ladrillo[0] * t
+            py = ladrillo[1] * t
+            area = None
+            if camara is not None:
+                # Las celdas fuera de la vista se descartan antes de dibujar
+                visible = camara.recortar(px, py, t, t)
+                if visible is None:
+                    continue
+                px, py, area = visible
+            forma = ladrillo[3] if len(ladrillo) > 3 else "cuadro"
+            sprite = sprites.get((ladrillo[2], forma, t))
+            if sprite is None:
+                sprite = self.sprite_ladrillo(ladrillo[2], forma)
+            lote.append((sprite, (px, py), area) if area else (sprite, (px, py)))
+        
+        if destino is None and self.modo_sucio:
+            for sprite, (px, py), *area in lote:
+                self._blit(sprite, px, py, area[0] if area else None)
+            return
+        destino = self.pantalla if destino is None else destino
+        if hasattr(destino, "fblits") and camara is None:  # pygame-ce (fblits no acepta 'area')
+            destino.fblits(lote)
+        else:
+            destino.blits(lote, doreturn=False)
+    
+    def crear_capa(self, ancho_celdas: int, alto_celdas: int) -> pygame.Surface:
+        """
+        Superficie transparente de ancho_celdas x alto_celdas, para partes de
+        la escena que solo se vuelven a pintar cuando cambian (ver dibujar_capa)
+        """
+        capa = pygame.Surface((ancho_celdas * self.tam_celda, alto_celdas * self.tam_celda), pygame.SRCALPHA)
+        if pygame.display.get_surface() is not None:
+            capa = capa.convert_alpha()
+        capa.fill((0, 0, 0, 0))
+        return capa
+    
+    def dibujar_capa(self, capa: pygame.Surface, x: int = 0, y: int = 0):
+        """
+        Dibuja una capa en la posición (x, y) en píxeles
+        
+        En modo de rectángulos sucios la capa es siempre la misma superficie:
+        quien la modifica debe marcar la zona con marcar_celdas_sucias().
+        """
+        self._blit(capa, x, y)
+    
+    def dibujar_indices(self, indices, ancho_celdas: int, alto_celdas: int, paleta, x: int = 0, y: int = 0,
+                        tam_celda: Optional[int] = None, nombre: str = "indices",
+                        version: Optional[int] = None):
+        """
+        Dibuja de una vez una grilla de índices de paleta (p.ej. un tablero
+        de Tetris o la ocupación de una arena de Snake)
+        
+        La grilla se arma como superficie de 8 bits a 1 píxel por celda
+        (sin copiar los datos) y se amplía con pygame.transform.scale, así
+        que el costo no depende de recorrer las celdas en Python. Las celdas
+        son planas (sin el borde de dibujar_ladrillo), pensado para grillas
+        grandes con celdas chicas.
+        
+        Cada nombre tiene su propio lienzo escalado: si una escena dibuja
+        varias grillas en el mismo frame, cada una debe usar un nombre
+        distinto. Si se pasa version y coincide (junto con la paleta, el
+        tamaño y la zona visible) con la de la llamada anterior de ese
+        nombre, solo se copia el lienzo ya escalado; sin version se vuelve
+        a escalar siempre.
+        
+        Args:
+            indices: Bytes por fila (bytes, bytearray, array('B'), memoryview,
+                MatrizEmpaquetada de tipo 'B') o una lista de filas de enteros
+            ancho_celdas: Columnas de la grilla
+            alto_celdas: Filas de la grilla
+            paleta: paleta[i] es el nombre del color del índice i; el índice 0
+                es siempre una celda vacía (transparente) y paleta[0] se ignora
+            x: Coordenada x en píxeles (del mundo, si hay cámara)
+            y: Coordenada y en píxeles (del mundo, si hay cámara)
+            tam_celda: Tamaño de celda en píxeles (por defecto el del motor)
+            nombre: Identifica la grilla (y su lienzo) entre frames
+            version: Número que quien llama cambia cada vez que modifica los
+                índices (p.ej. un contador de jugadas); no se comparan los datos
+        """
+        t = self.tam_celda if tam_celda is None else tam_celda
+        if isinstance(indices, (bytes, bytearray)):
+            datos = indices
+        elif isinstance(indices, MatrizEmpaquetada) and indices.tipo in ('b', 'B'):
+            datos = indices.datos
+        elif isinstance(indices, (list, MatrizEmpaquetada)):
+            datos = bytes(chain.from_iterable(indices))
+        else:
+            datos = memoryview(indices).cast('B')
+        if len(datos) != ancho_celdas * alto_celdas:
+            raise ValueError(f"Se esperaban {ancho_celdas * alto_celdas} índices, hay {len(datos)}")
+        
+        area = None
+        c0 = f0 = 0
+        if self.camara is not None:
+            # Solo las filas/columnas visibles pasan al escalado
+            cam = self.camara
+            c0 = max(0, (cam.x - x) // t)
+            f0 = max(0, (cam.y - y) // t)
+            c1 = min(ancho_celdas, -(-(cam.x + cam.vista.w - x) // t))
+            f1 = min(alto_celdas, -(-(cam.y + cam.vista.h - y) // t))
+            if c0 >= c1 or f0 >= f1:
+                return
+            if (c0, f0, c1, f1) != (0, 0, ancho_celdas, alto_celdas):
+                datos = b"".join(datos[f * ancho_celdas + c0:f * ancho_celdas + c1] for f in range(f0, f1))
+                x += c0 * t
+                y += f0 * t
+                ancho_celdas, alto_celdas = c1 - c0, f1 - f0
+            x, y, area = cam.recortar(x, y, ancho_celdas * t, alto_celdas * t)
+        
+        paleta = tuple(paleta)
+        clave = (version, c0, f0, ancho_celdas, alto_celdas, t, paleta)
+        anterior, lienzo = self._lienzos_indices.get(nombre, (None, None))
+        if version is None or clave != anterior:
+            colores = self._colores_paleta(paleta)
+            fuente = pygame.image.frombuffer(datos, (ancho_celdas, alto_celdas), 'P')
+            fuente.set_palette(colores)
+            tamaño = (ancho_celdas * t, alto_celdas * t)
+            if lienzo is None or lienzo.get_size() != tamaño:
+                lienzo = pygame.Surface(tamaño, depth=8)
+            lienzo.set_palette(colores)
+            pygame.transform.scale(fuente, tamaño, lienzo)
+            lienzo.set_colorkey(colores[0])
+            self._lienzos_indices[nombre] = (clave, lienzo)
+            if self.modo_sucio:
+                self.marcar_sucio(x, y, *(area[2:] if area else tamaño))
+        self._blit(lienzo, x, y, area)
+    
+    def _colores_paleta(self, paleta: tuple) -> list:
+        """Paleta de 256 entradas RGB; la 0 (vacío) es un color que no usa ninguna otra"""
+        if self._paleta_indices is not None and self._paleta_indices[0] == paleta:
+            return self._paleta_indices[1]
+        colores = [self.obtener_color(c) for c in paleta[1:256]]
+        vacio = next(c for c in ((255, 0, 254), (1, 2, 3), (254, 1, 255)) if c not in colores)
+        colores = [vacio] + colores
+        colores += [(0, 0, 0)] * (256 - len(colores))
+        self._paleta_indices = (paleta, colores)
+        return colores
+    
+    def _rasterizar(self, texto: str, fuente: pygame.font.Font, rgb: Tuple[int, int, int]) -> pygame.Surface:
+        """Renderiza un texto, convertido al formato de la pantalla si ya hay ventana"""
+        superficie = fuente.render(texto, True, rgb)
+        if pygame.display.get_surface() is not None:
+            superficie = superficie.convert_alpha()
+        return superficie
+    
+    def renderizar_texto(self, texto: str, color: str = "blanco", pequeño: bool = False) -> pygame.Surface:
+        """
+        Superficie con el texto rasterizado, reutilizada desde una caché LRU
+        de hasta TAM_CACHE_TEXTO entradas por (texto, fuente, color)
+        """
+        fuente = self.fuente_pequeña if pequeño else self.fuente
+        clave = (str(texto), fuente, self.obtener_color(color))
+        cache = self._cache_texto
+        superficie = cache.get(clave)
+        if superficie is not None:
+            cache.move_to_end(clave)
+            return superficie
+        superficie = cache[clave] = self._rasterizar(*clave)
+        if len(cache) > self.TAM_CACHE_TEXTO:
+            cache.popitem(last=False)
+        return superficie
     
     def dibujar_texto(self, x: int, y: int, texto: str, color: str = "blanco", pequeño: bool = False):
         """
@@ -81,23 +433,55 @@ class Graficos:
             color: Color del texto
             pequeño: Si True, usa fuente más pequeña
         """
+        self._blit(self.renderizar_texto(texto, color, pequeño), x, y)
+    
+    def dibujar_etiqueta(self, nombre: str, x: int, y: int, texto: str, color: str = "blanco", pequeño: bool = False):
+        """
+        Dibuja una etiqueta del HUD (p.ej. "score") que solo se vuelve a
+        rasterizar cuando cambia su texto; mientras tanto se copia la misma
+        superficie. A diferencia de dibujar_texto(), los valores viejos de
+        un contador no ocupan la caché LRU.
+        
+        Args:
+            nombre: Identificador de la etiqueta
+            x: Coordenada x en píxeles
+            y: Coordenada y en píxeles
+            texto: Texto actual (p.ej. f"Score: {score}")
+            color: Color del texto
+            pequeño: Si True, usa fuente más pequeña
+        """
         fuente = self.fuente_pequeña if pequeño else self.fuente
-        rgb = self.obtener_color(color)
-        superficie = fuente.render(str(texto), True, rgb)
-        self.pantalla.blit(superficie, (x, y))
+        clave = (texto, fuente, self.obtener_color(color))
+        etiqueta = self._etiquetas.get(nombre)
+        if etiqueta is None or etiqueta[0] != clave:
+            etiqueta = self._etiquetas[nombre] = (clave, self._rasterizar(str(texto), fuente, clave[2]))
+        self._blit(etiqueta[1], x, y)
+    
+    def quitar_etiqueta(self, nombre: str):
+        """Libera la superficie de una etiqueta del HUD que ya no se muestra"""
+        self._etiquetas.pop(nombre, None)
     
     def dibujar_rectangulo(self, x: int, y: int, ancho: int, alto: int, color: str, relleno: bool = True):
         """Dibuja un rectángulo (útil para bordes, UI, etc.)"""
-        rgb = self.obtener_color(color)
-        rect = pygame.Rect(x, y, ancho, alto)
-        if relleno:
-            pygame.draw.rect(self.pantalla, rgb, rect)
+        op = ("rect", self.obtener_color(color), x, y, ancho, alto, 0 if relleno else 2)
+        if self.modo_sucio:
+            self._registrar(op, pygame.Rect(x, y, ancho, alto))
         else:
-            pygame.draw.rect(self.pantalla, rgb, rect, 2)
+            self._ejecutar(op)
     
     def limpiar_pantalla(self, color: str = "negro"):
-        """Limpia toda la pantalla con un color sólido"""
+        """
+        Limpia toda la pantalla con un color sólido
+        
+        En modo de rectángulos sucios solo fija el color del fondo: la
+        pantalla no se borra y se restauran únicamente las zonas que cambian.
+        """
         rgb = self.obtener_color(color)
+        if self.modo_sucio:
+            if rgb != self._color_fondo:
+                self._color_fondo = rgb
+                self._reconstruir_fondo()
+            return
         self.pantalla.fill(rgb)
     
     def dibujar_cuadricula(self, ancho_celdas: int, alto_celdas: int, color_linea: str = "gris", opacidad: float = 0.2):
@@ -109,7 +493,33 @@ class Graficos:
             alto_celdas: Alto en celdas
             color_linea: Color base de las líneas
             opacidad: Opacidad de 0.0 a 1.0 (0.2 = 20% visible)
+        
+        La cuadrícula se pre-renderiza una vez y se reutiliza mientras no
+        cambien sus parámetros.
         """
+        clave = (ancho_celdas, alto_celdas, self.tam_celda, color_linea, opacidad)
+        if self._cuadricula is None or self._cuadricula[0] != clave:
+            self._cuadricula = (clave, self._crear_cuadricula(ancho_celdas, alto_celdas, color_linea, opacidad))
+            if self.modo_sucio:
+                # En modo sucio la cuadrícula (estática) es parte del fondo
+                self._reconstruir_fondo()
+        
+        # Blit sobre la pantalla principal
+        if not self.modo_sucio:
+            self._pintar_cuadricula(self.pantalla)
+    
+    def _pintar_cuadricula(self, destino: pygame.Surface):
+        """Copia la cuadrícula en caché (solo la parte visible si hay cámara)"""
+        superficie = self._cuadricula[1]
+        if self.camara is None:
+            destino.blit(superficie, (0, 0))
+            return
+        visible = self.camara.recortar(0, 0, *superficie.get_size())
+        if visible is not None:
+            destino.blit(superficie, visible[:2], visible[2])
+    
+    def _crear_cuadricula(self, ancho_celdas: int, alto_celdas: int, color_linea: str, opacidad: float) -> pygame.Surface:
+        """Renderiza la cuadrícula (líneas sobre fondo transparente)"""
         rgb = self.obtener_color(color_linea)
         # Aplicar opacidad reduciendo cada componente RGB
         rgb_opaco = tuple(int(c * opacidad) for c in rgb)
@@ -117,8 +527,11 @@ class Graficos:
         ancho_px = ancho_celdas * self.tam_celda
         alto_px = alto_celdas * self.tam_celda
         
-        # Crear superficie temporal con alpha
-        superficie_grid = pygame.Surface((ancho_px, alto_px), pygame.SRCALPHA)
+        # Las líneas son opacas y el resto transparente: basta un color clave
+        # (con RLE el blit salta los tramos transparentes) en vez de alpha por píxel
+        clave = (255, 0, 255) if rgb_opaco != (255, 0, 255) else (0, 255, 0)
+        superficie_grid = pygame.Surface((ancho_px, alto_px))
+        superficie_grid.fill(clave)
         
         # Líneas verticales
         for x in range(0, ancho_px + 1, self.tam_celda):
@@ -128,5 +541,127 @@ class Graficos:
         for y in range(0, alto_px + 1, self.tam_celda):
             pygame.draw.line(superficie_grid, rgb_opaco, (0, y), (ancho_px, y), 1)
         
-        # Blit sobre la pantalla principal
-        self.pantalla.blit(superficie_grid, (0, 0))
\ No newline at end of file
+        if pygame.display.get_surface() is not None:
+            superficie_grid = superficie_grid.convert()
+        superficie_grid.set_colorkey(clave, pygame.RLEACCEL)
+        return superficie_grid
+    
+    # --------------------
+    # Rectángulos sucios
+    # --------------------
+    
+    def activar_rects_sucios(self, color_fondo: str = "negro"):
+        """
+        Activa el modo de rectángulos sucios
+        
+        Las funciones de dibujo dejan de pintar al instante y registran cada
+        operación con su rectángulo. En presentar() se compara la lista con
+        la del frame anterior: solo las zonas de operaciones que aparecieron
+        o desaparecieron (más las marcadas con marcar_sucio()) se restauran
+        desde un fondo en caché (color de fondo + cuadrícula), se vuelven a
+        pintar y se envían con pygame.display.update(rects).
+        """
+        self.modo_sucio = True
+        self._fondo = pygame.Surface(self.pantalla.get_size())
+        if pygame.display.get_surface() is not None:
+            self._fondo = self._fondo.convert()
+        self._color_fondo = self.obtener_color(color_fondo)
+        self._ops, self._rects = [], []
+        self._ops_previas, self._rects_previos = [], []
+        self._marcados = []
+        self._reconstruir_fondo()
+    
+    def desactivar_rects_sucios(self):
+        """Vuelve al modo normal (pantalla completa en cada frame)"""
+        self.modo_sucio = False
+        self._fondo = None
+        self._ops, self._rects = [], []
+        self._ops_previas, self._rects_previos = [], []
+        self._marcados = []
+    
+    def marcar_sucio(self, x: int, y: int, ancho: int, alto: int):
+        """Fuerza a restaurar y volver a pintar una zona (en píxeles) en el próximo presentar()"""
+        if self.modo_sucio:
+            self._marcados.append(pygame.Rect(x, y, ancho, alto))
+    
+    def marcar_celdas_sucias(self, x: int, y: int, ancho: int = 1, alto: int = 1):
+        """Como marcar_sucio() pero en coordenadas de celdas"""
+        t = self.tam_celda
+        self.marcar_sucio(x * t, y * t, ancho * t, alto * t)
+    
+    def marcar_todo_sucio(self):
+        """Fuerza a volver a pintar la pantalla completa en el próximo presentar()"""
+        self._todo_sucio = True
+    
+    def presentar(self):
+        """
+        Muestra el frame: pygame.display.flip() en modo normal, o solo los
+        rectángulos que cambiaron en modo de rectángulos sucios
+        
+        Si se dibuja en una Surface fuera de pantalla (Motor headless) el
+        frame queda terminado en ella y no se envía nada al display.
+        """
+        en_ventana = self.pantalla is pygame.display.get_surface()
+        if not self.modo_sucio:
+            if en_ventana:
+                pygame.display.flip()
+            return
+        
+        # Si la cámara se movió, el fondo (cuadrícula) cambió entero
+        version = self.camara.version if self.camara is not None else None
+        if version != self._version_camara:
+            self._version_camara = version
+            self._reconstruir_fondo()
+        
+        ops, rects = self._ops, self._rects
+        if self._todo_sucio:
+            sucios = [self.pantalla.get_rect()]
+        else:
+            actuales = set(ops)
+            previas = set(self._ops_previas)
+            sucios = self._marcados
+            sucios.extend(r for op, r in zip(self._ops_previas, self._rects_previos) if op not in actuales)
+            sucios.extend(r for op, r in zip(ops, rects) if op not in previas)
+        
+        if sucios:
+            # Sin repetidos (los Rect no son hashables)
+            sucios = list({tuple(r): r for r in sucios}.values())
+            pantalla = self.pantalla
+            for rect in sucios:
+                pantalla.set_clip(rect)
+                pantalla.blit(self._fondo, rect, rect)
+                for i in rect.collidelistall(rects):
+                    self._ejecutar(ops[i])
+            pantalla.set_clip(None)
+            if en_ventana:
+                pygame.display.update(sucios)
+        
+        self._ops_previas, self._rects_previos = ops, rects
+        self._ops, self._rects, self._marcados = [], [], []
+        self._todo_sucio = False
+    
+    def _registrar(self, op: tuple, rect: pygame.Rect):
+        self._ops.append(op)
+        self._rects.append(rect)
+    
+    def _blit(self, superficie: pygame.Surface, x: int, y: int, area: Optional[tuple] = None):
+        if self.modo_sucio:
+            rect = pygame.Rect(x, y, area[2], area[3]) if area else superficie.get_rect(topleft=(x, y))
+            self._registrar(("blit", superficie, x, y, area), rect)
+        else:
+            self.pantalla.blit(superficie, (x, y), area)
+    
+    def _ejecutar(self, op: tuple):
+        """Pinta en la pantalla una operación registrada"""
+        if op[0] == "blit":
+            self.pantalla.blit(op[1], (op[2], op[3]), op[4])
+        else:
+            _, rgb, x, y, ancho, alto, grosor = op
+            pygame.draw.rect(self.pantalla, rgb, pygame.Rect(x, y, ancho, alto), grosor)
+    
+    def _reconstruir_fondo(self):
+        """Vuelve a pintar el fondo en caché (color + cuadrícula) y marca todo sucio"""
+        self._fondo.fill(self._color_fondo)
+        if self._cuadricula is not None:
+            self._pintar_cuadricula(self._fondo)
+        self._todo_sucio = True
@@ -2,20 +2,189 @@
 Intérprete del AST - Lee arbol.ast y extrae configuraciones
 Conecta el DSL .brik con el motor de juego
 """
+import os
+import re
 import json
+import mmap
+import threading
+from collections.abc import Mapping
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Optional, Tuple, Union
+
+from analizador import LexerRapido, MatrizEmpaquetada, Parser, decodificar_json, escribir_ast
+
+
+class _Config:
+    """
+    Base de las configuraciones compiladas desde el AST: atributos fijos
+    (__slots__), con los valores por defecto ya aplicados e inmutables
+    """
+    __slots__ = ()
+    
+    def __init__(self, **valores):
+        for campo in self.__slots__:
+            object.__setattr__(self, campo, valores[campo])
+    
+    def __setattr__(self, nombre, valor):
+        raise AttributeError(f"{type(self).__name__} es inmutable")
+    
+    def __delattr__(self, nombre):
+        raise AttributeError(f"{type(self).__name__} es inmutable")
+    
+    def __repr__(self) -> str:
+        campos = ", ".join(f"{c}={getattr(self, c)!r}" for c in self.__slots__)
+        return f"{type(self).__name__}({campos})"
+
+
+class ConfigGeneral(_Config):
+    """Bloque parametros_generales"""
+    __slots__ = ("nombre_juego", "version", "dimensiones", "tam_celda")
+
+
+class ConfigReglas(_Config):
+    """Bloque reglas (Snake y Tetris)"""
+    __slots__ = ("vidas_iniciales", "score_inicial", "tick_base", "incremento_velocidad",
+                 "hard_drop", "ghost_piece", "lineas_por_nivel", "vista_previa")
+
+
+class ConfigSnake(_Config):
+    """Bloque snake"""
+    __slots__ = ("dimensiones", "velocidad_inicial", "aumento_velocidad", "color")
+
+
+class ConfigPuntaje(_Config):
+    """Bloque puntaje (Tetris)"""
+    __slots__ = ("score_por_linea", "combo_bonus", "tetris_bonus")
+
+
+class ConfigJuego(_Config):
+    """Configuración completa compilada una vez al cargar el AST"""
+    __slots__ = ("general", "reglas", "snake", "puntaje", "condicion_fin")
+
+
+def _tupla(valor):
+    """Listas del AST -> tuplas (inmutables)"""
+    return tuple(valor) if isinstance(valor, list) else valor
+
+
+# Primera clave del objeto raíz en un JSON indentado: "{" salto "<sangría>"
+_re_sangria_raiz = re.compile(rb'\{\r?\n([ \t]+)"')
+# Clave JSON seguida de ': ' (el valor empieza justo después)
+_re_clave = re.compile(rb'("(?:[^"\\\r\n]|\\.)*"): ')
+
+
+class ASTPerezoso(Mapping):
+    """
+    Vista de solo lectura de un arbol.ast que decodifica cada bloque de
+    nivel superior recién en su primer acceso (y lo guarda en caché)
+    
+    Al crearla solo se recorre el archivo (vía mmap) para indexar los rangos
+    de bytes de cada clave raíz. Funciona con el JSON indentado que escribe
+    analizador.py: en él los saltos de línea nunca aparecen dentro de
+    cadenas, así que una línea con la sangría exacta del primer nivel seguida
+    de '"' es siempre una clave raíz. Si el archivo es JSON compacto se
+    decodifica completo de una vez.
+    
+    Si el archivo cambia en disco, el siguiente bloque sin decodificar lo
+    vuelve a indexar (descartando la caché) y llama a al_reindexar.
+    """
+    
+    def __init__(self, ruta: Path, al_reindexar: Optional[Callable[[], None]] = None):
+        self.ruta = Path(ruta)
+        self.al_reindexar = al_reindexar
+        self._cache: Dict[str, Any] = {}
+        self._indice: Dict[str, tuple] = {}
+        self._firma = None
+        self._indexar()
+    
+    def _indexar(self):
+        """Construye {clave: (inicio, fin)} con los bytes del valor de cada clave raíz"""
+        self._cache.clear()
+        self._indice.clear()
+        with open(self.ruta, 'rb') as f:
+            st = os.fstat(f.fileno())
+            self._firma = (st.st_size, st.st_mtime_ns)
+            if st.st_size == 0:
+                raise ValueError(f"Archivo AST vacío: {self.ruta}")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                m = _re_sangria_raiz.match(mm, 0)
+                if m is None:
+                    # JSON compacto (o "{}"): no hay forma barata de indexarlo
+                    self._cache.update(json.loads(mm[:], object_hook=decodificar_json))
+                    self._indice.update((clave, None) for clave in self._cache)
+                    return
+                # Búsqueda literal (rápida) del inicio de cada línea de primer nivel
+                inicio_linea = b'\n' + m.group(1) + b'"'
+                claves = []
+                pos = mm.find(inicio_linea)
+                while pos != -1:
+                    mc = _re_clave.match(mm, pos + len(inicio_linea) - 1)
+                    if mc is not None:
+                        claves.append(mc)
+                    pos = mm.find(inicio_linea, pos + 1)
+                fin_objeto = mm.rfind(b'}')
+                for i, mc in enumerate(claves):
+                    # el valor termina donde empieza la línea de la siguiente clave
+                    fin = mm.rfind(b'\n', 0, claves[i + 1].start()) if i + 1 < len(claves) else fin_objeto
+                    clave = json.loads(mc.group(1))
+                    self._indice[clave] = (mc.end(), fin)
+    
+    def _decodificar(self, clave: str) -> Any:
+        with open(self.ruta, 'rb') as f:
+            st = os.fstat(f.fileno())
+            if (st.st_size, st.st_mtime_ns) != self._firma:
+                # el archivo fue regenerado: los rangos viejos ya no sirven
+                f.close()
+                self._indexar()
+                if self.al_reindexar is not None:
+                    self.al_reindexar()
+                return self[clave]
+            inicio, fin = self._indice[clave]
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                texto = mm[inicio:fin].rstrip().rstrip(b',')
+        return json.loads(texto, object_hook=decodificar_json)
+    
+    def __getitem__(self, clave: str) -> Any:
+        try:
+            return self._cache[clave]
+        except KeyError:
+            pass
+        if clave not in self._indice:
+            raise KeyError(clave)
+        valor = self._cache[clave] = self._decodificar(clave)
+        return valor
+    
+    def __contains__(self, clave) -> bool:
+        return clave in self._indice
+    
+    def __iter__(self):
+        return iter(self._indice)
+    
+    def __len__(self) -> int:
+        return len(self._indice)
+    
+    def decodificados(self) -> list:
+        """Claves raíz ya decodificadas (útil para diagnóstico)"""
+        return list(self._cache)
+    
+    def __repr__(self) -> str:
+        return f"ASTPerezoso({self.ruta}, {len(self._cache)}/{len(self._indice)} bloques decodificados)"
+
 
 class InterpreteAST:
     """Lee y parsea el archivo arbol.ast generado por analizador.py"""
     
-    def __init__(self, ruta_ast: str):
+    def __init__(self, ruta_ast: str, perezoso: bool = False):
         """
         Args:
             ruta_ast: Ruta al archivo arbol.ast
+            perezoso: Si es True, cada bloque de nivel superior se decodifica
+                recién cuando se accede a él (ver ASTPerezoso)
         """
         self.ruta = Path(ruta_ast)
-        self.ast: Dict[str, Any] = {}
+        self.perezoso = perezoso
+        self.ast: Union[Dict[str, Any], ASTPerezoso] = {}
+        self.config: Optional[ConfigJuego] = None
         self.cargar()
     
     def cargar(self):
@@ -23,8 +192,99 @@ class InterpreteAST:
         if not self.ruta.exists():
             raise FileNotFoundError(f"No se encontró el archivo AST: {self.ruta}")
         
-        with open(self.ruta, 'r', encoding='utf-8') as f:
-            self.ast = json.load(f)
+        if self.perezoso:
+            # config debe seguir al AST si el archivo se regenera
+            self.ast = ASTPerezoso(self.ruta, al_reindexar=self._recompilar)
+        else:
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                # decodificar_json reconstruye las matrices de 'analizador.py --empaquetar'
+                self.ast = json.load(f, object_hook=decodificar_json)
+        self.config = self.compilar_config()
+    
+    def _recompilar(self):
+        self.config = self.compilar_config()
+    
+    @classmethod
+    def desde_ast(cls, ast: Dict[str, Any], ruta: Optional[str] = None) -> "InterpreteAST":
+        """
+        Crea un intérprete a partir de un AST ya analizado, sin leer arbol.ast
+        
+        Args:
+            ast: Dict producido por Parser.parse()
+            ruta: Origen del AST (solo informativo)
+        """
+        interprete = cls.__new__(cls)
+        interprete.ruta = Path(ruta) if ruta is not None else None
+        interprete.perezoso = False
+        interprete.ast = ast
+        interprete.config = interprete.compilar_config()
+        return interprete
+    
+    @classmethod
+    def desde_brik(cls, ruta_brik: str, empaquetar_matrices: bool = False) -> "InterpreteAST":
+        """
+        Analiza un .brik en el mismo proceso (Lexer/Parser de analizador.py)
+        y crea el intérprete directamente con el dict resultante, sin pasar
+        por arbol.ast
+        
+        Lanza LexerError/ParserError si el .brik tiene errores.
+        """
+        ruta = Path(ruta_brik)
+        if not ruta.exists():
+            raise FileNotFoundError(f"No se encontró el archivo .brik: {ruta}")
+        with open(ruta, 'r', encoding='utf-8') as f:
+            texto = f.read()
+        ast = Parser(LexerRapido(texto), empaquetar_matrices).parse()
+        return cls.desde_ast(ast, ruta)
+    
+    def guardar(self, ruta_salida: str):
+        """Escribe el AST actual como arbol.ast (mismo formato que analizador.py)"""
+        escribir_ast(dict(self.ast), ruta_salida)
+    
+    def reemplazar(self, ast: Dict[str, Any], config: Optional[ConfigJuego] = None):
+        """
+        Sustituye el AST y su configuración compilada (recarga en caliente)
+        
+        Quien guarde una referencia a este intérprete ve los valores nuevos;
+        si 'config' no se pasa se compila a partir de 'ast'.
+        """
+        self.ast = ast
+        self.config = config if config is not None else self.compilar_config()
+    
+    def compilar_config(self) -> ConfigJuego:
+        """
+        Compila el AST a objetos de configuración inmutables
+        
+        Para rutas calientes (cada frame, cada manzana): el juego lee
+        atributos como self.ast.config.snake.color sin reconstruir dicts.
+        """
+        params = self.obtener_parametros_generales()
+        general = ConfigGeneral(
+            nombre_juego=params["nombre_juego"],
+            version=params["version"],
+            dimensiones=_tupla(params["dimensiones"]),
+            tam_celda=params["tam_celda"]
+        )
+        
+        reglas_ast = self.obtener_bloque("reglas") or {}
+        reglas = ConfigReglas(
+            **self.obtener_reglas(),
+            lineas_por_nivel=reglas_ast.get("lineas_por_nivel", 10),
+            vista_previa=reglas_ast.get("vista_previa", 1)
+        )
+        
+        snake = self.obtener_config_snake()
+        if snake is not None:
+            snake["dimensiones"] = _tupla(snake["dimensiones"])
+            snake = ConfigSnake(**snake)
+        
+        return ConfigJuego(
+            general=general,
+            reglas=reglas,
+            snake=snake,
+            puntaje=ConfigPuntaje(**self.obtener_puntaje_config()),
+            condicion_fin=self.obtener_condicion_fin()
+        )
     
     def obtener(self, ruta_clave: str, default=None) -> Any:
         """
@@ -38,13 +298,32 @@ class InterpreteAST:
         valor = self.ast
         
         for parte in partes:
-            if isinstance(valor, dict) and parte in valor:
+            if isinstance(valor, Mapping) and parte in valor:
                 valor = valor[parte]
             else:
                 return default
         
         return valor
     
+    def obtener_matriz(self, ruta_clave: str) -> Optional[memoryview]:
+        """
+        Vista 2D de solo lectura (memoryview con shape (filas, columnas)) de
+        una matriz numérica del AST, usando notación de punto
+
+        Ejemplo:
+            obtener_matriz("piezas.T.matriz")[1, 1] -> 1
+
+        Si el AST se generó con --empaquetar la vista no copia datos; si la
+        matriz viene como listas anidadas se empaqueta al vuelo. Retorna
+        None si el valor no es una matriz numérica rectangular.
+        """
+        valor = self.obtener(ruta_clave)
+        if isinstance(valor, list):
+            valor = MatrizEmpaquetada.desde_listas(valor)
+        if isinstance(valor, MatrizEmpaquetada):
+            return valor.vista()
+        return None
+    
     def obtener_bloque(self, nombre_bloque: str) -> Optional[Dict]:
         """Obtiene un bloque completo del AST"""
         return self.ast.get(nombre_bloque)
@@ -124,4 +403,66 @@ class InterpreteAST:
         return fin.get("condicion", "")
     
     def __repr__(self) -> str:
-        return f"InterpreteAST({self.ruta})"
\ No newline at end of file
+        return f"InterpreteAST({self.ruta})"
+
+
+class RegistroAST:
+    """
+    Registro de intérpretes compartido por todo el proceso
+    
+    Cada arbol.ast se carga y compila una sola vez: todos los que piden la
+    misma ruta (resuelta) reciben el mismo InterpreteAST mientras el archivo
+    conserve su fecha de modificación y tamaño. Si cambia, la siguiente
+    consulta lo vuelve a cargar.
+    """
+    
+    def __init__(self):
+        self._entradas: Dict[Tuple[Path, bool], Tuple[Tuple[int, int], InterpreteAST]] = {}
+        self._lock = threading.Lock()
+    
+    def obtener(self, ruta_ast: str, perezoso: bool = False) -> InterpreteAST:
+        """
+        Intérprete del AST en 'ruta_ast', cargado solo si no está registrado
+        o si el archivo cambió desde la última carga
+        
+        'ruta_ast' puede ser un arbol.ast o directamente un .brik, que se
+        analiza en el mismo proceso ('perezoso' no aplica a un .brik).
+        """
+        ruta = Path(ruta_ast).resolve()
+        try:
+            st = os.stat(ruta)
+        except OSError:
+            raise FileNotFoundError(f"No se encontró el archivo AST: {ruta_ast}")
+        firma = (st.st_mtime_ns, st.st_size)
+        clave = (ruta, perezoso)
+        
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada[0] == firma:
+                return entrada[1]
+            if ruta.suffix == '.brik':
+                interprete = InterpreteAST.desde_brik(ruta)
+            else:
+                interprete = InterpreteAST(ruta, perezoso=perezoso)
+            self._entradas[clave] = (firma, interprete)
+            return interprete
+    
+    def invalidar(self, ruta_ast: Optional[str] = None):
+        """Olvida un AST registrado (o todos si no se indica ruta)"""
+        with self._lock:
+            if ruta_ast is None:
+                self._entradas.clear()
+                return
+            ruta = Path(ruta_ast).resolve()
+            for clave in [c for c in self._entradas if c[0] == ruta]:
+                del self._entradas[clave]
+    
+    def __len__(self) -> int:
+        return len(self._entradas)
+    
+    def __repr__(self) -> str:
+        return f"RegistroAST({len(self._entradas)} ASTs)"
+
+
+# Registro único del proceso (ver Motor.cargar_ast)
+registro_ast = RegistroAST()
@@ -4,11 +4,21 @@ Requisitos de la Entrega 2:
 - Ventana 640x480
 - Game loop: eventos → actualización → renderizado
 """
+import os
+import queue
+import threading
+import time
 import pygame
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
 from typing import Optional, Callable
 from .graficos import Graficos
 from .entrada import ControladorEntrada
-from .interprete import InterpreteAST
+from .interprete import ASTPerezoso, InterpreteAST, registro_ast
+from .recarga import RecargadorBrik
+from .grabacion import GrabadorFrames
+from .estados import BufferTriple
 
 class Motor:
     """Motor de juego base - corazón del sistema"""
@@ -16,48 +26,137 @@ class Motor:
     ANCHO_VENTANA = 640
     ALTO_VENTANA = 520
     
-    def __init__(self, titulo: str = "Motor .brik", fps: int = 60):
+    def __init__(self, titulo: str = "Motor .brik", fps: int = 60, rects_sucios: bool = False,
+                 headless: Optional[bool] = None, ticks_por_segundo: Optional[float] = None,
+                 max_ticks_por_frame: int = 8, logica_en_hilo: bool = False):
         """
         Inicializa el motor gráfico
         
         Args:
             titulo: Título de la ventana
             fps: Frames por segundo objetivo
+            rects_sucios: Actualizar en pantalla solo las zonas que cambian
+                en cada frame (ver Graficos.activar_rects_sucios)
+            headless: Renderizar sin ventana, en una Surface fuera de pantalla
+                (driver de video "dummy" de SDL). Por defecto se activa si
+                SDL_VIDEODRIVER=dummy, así los juegos corren sin cambios en
+                servidores sin display
+            ticks_por_segundo: Frecuencia fija de la lógica. Si se indica,
+                callback_actualizar recibe siempre dt = 1 / ticks_por_segundo
+                y se llama tantas veces por frame como pida el tiempo
+                transcurrido; si es None, una vez por frame con el dt del frame
+            max_ticks_por_frame: Tope de ticks de lógica en un mismo frame;
+                el atraso que lo excede se descarta (evita la "espiral de la
+                muerte" cuando la lógica no alcanza al tiempo real)
+            logica_en_hilo: Correr la lógica en un hilo propio a
+                ticks_por_segundo (obligatorio), separada del render; el juego
+                debe dar callback_estado (ver iniciar)
         """
-        pygame.init()
+        if logica_en_hilo and not ticks_por_segundo:
+            raise ValueError("logica_en_hilo requiere ticks_por_segundo")
+        if headless is None:
+            headless = os.environ.get("SDL_VIDEODRIVER") == "dummy"
+        self.headless = headless
+        self._iniciar_pygame(headless)
         
         # Configuración de ventana
-        self.pantalla = pygame.display.set_mode((self.ANCHO_VENTANA, self.ALTO_VENTANA))
+        if headless:
+            # La ventana "dummy" de 1x1 solo fija el formato de píxel para
+            # convert()/convert_alpha(); se dibuja en una Surface propia
+            pygame.display.set_mode((1, 1))
+            self.pantalla = pygame.Surface((self.ANCHO_VENTANA, self.ALTO_VENTANA)).convert()
+        else:
+            self.pantalla = pygame.display.set_mode((self.ANCHO_VENTANA, self.ALTO_VENTANA))
         pygame.display.set_caption(titulo)
         
         # Reloj para controlar FPS
         self.reloj = pygame.time.Clock()
         self.fps = fps
+        self.rects_sucios = rects_sucios
+        
+        # Paso fijo de la lógica (ver _avanzar_logica)
+        self.paso_fijo = 1.0 / ticks_por_segundo if ticks_por_segundo else None
+        self.max_ticks_por_frame = max_ticks_por_frame
+        self.acumulador = 0.0
+        self.ticks = 0
+        self.ticks_descartados = 0
+        self.alfa = 1.0  # fracción del siguiente tick ya transcurrida (para interpolar al dibujar)
+        
+        # Lógica en un hilo propio (ver _bucle_logica)
+        self.logica_en_hilo = logica_en_hilo
+        self.estado = None  # última instantánea del juego que ve el render
+        self._estados: Optional[BufferTriple] = None
+        self._cola_logica: "queue.Queue" = queue.Queue()  # (instante, eventos de teclado | función)
+        self._hilo_logica: Optional[threading.Thread] = None
+        self._error_logica: Optional[BaseException] = None
         
         # Subsistemas
         self.graficos: Optional[Graficos] = None
         self.entrada = ControladorEntrada()
         self.interprete: Optional[InterpreteAST] = None
+        self.recargador: Optional[RecargadorBrik] = None
+        self.grabador: Optional[GrabadorFrames] = None
         
         # Control del loop
         self.ejecutando = False
         self.pausado = False
+        self.frames = 0  # frames presentados desde iniciar()
         
         # Callbacks del juego (deben ser asignados por el juego específico)
         self.callback_actualizar: Optional[Callable] = None
-        self.callback_renderizar: Optional[Callable] = None
+        self.callback_renderizar: Optional[Callable] = None  # con ticks_por_segundo recibe alfa (interpolación entre ticks)
         self.callback_inicializar: Optional[Callable] = None
+        self.callback_recargar: Optional[Callable] = None  # recibe las claves que cambiaron
+        self.callback_frame: Optional[Callable] = None  # recibe el número de frame ya presentado
+        self.callback_estado: Optional[Callable] = None  # instantánea inmutable del juego (logica_en_hilo)
+    
+    @staticmethod
+    def _iniciar_pygame(headless: bool):
+        """
+        pygame.init() con el driver de video que pide el modo
+        
+        SDL_VIDEODRIVER=dummy solo se fija mientras se inicializa el display
+        y luego se restaura, así un Motor con ventana creado después en el
+        mismo proceso (tests, herramientas) no queda sin ventana. Si el
+        display ya estaba iniciado con el otro driver se reinicia.
+        """
+        if pygame.display.get_init() and (pygame.display.get_driver() == "dummy") != headless:
+            pygame.display.quit()
+        if not headless:
+            pygame.init()
+            return
+        previo = os.environ.get("SDL_VIDEODRIVER")
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        try:
+            pygame.init()
+        finally:
+            if previo is None:
+                del os.environ["SDL_VIDEODRIVER"]
+            else:
+                os.environ["SDL_VIDEODRIVER"] = previo
     
-    def cargar_ast(self, ruta_ast: str, tam_celda: int = 10):
+    def cargar_ast(self, ruta_ast: str, tam_celda: int = 10, perezoso: bool = False,
+                   escribir_ast: bool = False):
         """
-        Carga un archivo AST y configura el motor
+        Carga un archivo AST (o directamente un .brik) y configura el motor
         
         Args:
-            ruta_ast: Ruta al arbol.ast
+            ruta_ast: Ruta al arbol.ast, o al .brik para analizarlo en el
+                mismo proceso sin pasar por arbol.ast
             tam_celda: Tamaño de celda para gráficos
+            perezoso: Decodificar cada bloque del AST solo al usarlo
+            escribir_ast: Con un .brik, guardar además arbol.ast junto a él
+        
+        El intérprete sale del registro compartido (registro_ast): si otra
+        parte del proceso ya cargó el mismo archivo sin que cambiara, se
+        reutiliza sin volver a leerlo.
         """
-        self.interprete = InterpreteAST(ruta_ast)
+        self.interprete = registro_ast.obtener(ruta_ast, perezoso=perezoso)
+        if escribir_ast and Path(ruta_ast).suffix == '.brik':
+            self.interprete.guardar(Path(ruta_ast).with_name('arbol.ast'))
         self.graficos = Graficos(self.pantalla, tam_celda)
+        if self.rects_sucios:
+            self.graficos.activar_rects_sucios("negro")
         
         # Configurar controles desde AST
         controles = self.interprete.obtener_controles()
@@ -70,6 +169,189 @@ class Motor:
         params = self.interprete.obtener_parametros_generales()
         pygame.display.set_caption(params["nombre_juego"])
     
+    def vigilar_brik(self, ruta_brik: str, intervalo: float = 0.5):
+        """
+        Activa la recarga en caliente: un hilo de fondo vuelve a analizar el
+        .brik cada vez que cambia y el motor aplica la nueva configuración al
+        inicio del siguiente frame, llamando a callback_recargar(claves)
+        
+        Args:
+            ruta_brik: Archivo .brik del que proviene el AST cargado
+            intervalo: Segundos entre revisiones del archivo
+        """
+        if self.interprete is None:
+            raise RuntimeError("Debe cargar un AST antes de vigilar el .brik (usar cargar_ast())")
+        self.dejar_de_vigilar()
+        # Copia tomada en este hilo: el vigilante la compara sin tocar el
+        # intérprete. Un AST perezoso no se compara (decodificaría todos sus
+        # bloques en el otro hilo); ahí la primera lectura del .brik es la base
+        ast = self.interprete.ast
+        base = None if isinstance(ast, ASTPerezoso) else dict(ast)
+        self.recargador = RecargadorBrik(ruta_brik, intervalo, base=base)
+        self.recargador.iniciar()
+    
+    def dejar_de_vigilar(self):
+        """Detiene la recarga en caliente"""
+        if self.recargador is not None:
+            self.recargador.detener()
+            self.recargador = None
+    
+    def _aplicar_recarga(self):
+        """Aplica (sin esperar) una recarga pendiente del .brik"""
+        recarga = self.recargador.tomar()
+        if recarga is None:
+            return
+        if recarga.error is not None:
+            print(f"⚠️ {self.recargador.ruta.name} no se recargó: {recarga.error}")
+            return
+        
+        if "parametros_generales" in recarga.claves:
+            pygame.display.set_caption(recarga.config.general.nombre_juego)
+        
+        def aplicar():
+            # El intérprete viene del registro compartido: que los demás
+            # vuelvan a leer su archivo en vez de recibir el .brik recargado
+            registro_ast.invalidar(self.interprete.ruta)
+            self.interprete.reemplazar(recarga.ast, recarga.config)
+            if "controles" in recarga.claves:
+                self.entrada.mapa_accion_tecla.clear()
+                self.entrada.configurar_desde_ast(self.interprete.obtener_controles())
+            if self.callback_recargar:
+                self.callback_recargar(recarga.claves)
+        
+        # Con la lógica en otro hilo, la recarga se aplica entre dos de sus ticks
+        if self._hilo_logica is not None:
+            self._cola_logica.put((time.perf_counter(), aplicar))
+        else:
+            aplicar()
+    
+    def grabar(self, ruta: str, capacidad: int = 8, politica: str = "descartar",
+               comprimir: bool = False) -> GrabadorFrames:
+        """
+        Graba cada frame presentado en 'ruta' (ver GrabadorFrames)
+        
+        Args:
+            ruta: Archivo de salida (se lee con motor.grabacion.leer_grabacion)
+            capacidad: Buffers preasignados entre el game loop y el escritor
+            politica: 'descartar' (nunca frena el juego) o 'bloquear'
+                (no pierde frames) cuando el escritor no da abasto
+            comprimir: Comprimir cada frame con zlib
+        """
+        self.detener_grabacion()
+        self.grabador = GrabadorFrames(ruta, self.pantalla, capacidad, politica, comprimir)
+        return self.grabador
+    
+    def detener_grabacion(self):
+        """Termina de escribir la grabación en curso e informa sus estadísticas"""
+        if self.grabador is None:
+            return
+        grabador, self.grabador = self.grabador, None
+        grabador.cerrar()
+        print(f"🎥 {grabador.ruta.name}: {grabador.escritos} frames grabados, "
+              f"{grabador.descartados} descartados, {grabador.costo_medio_ms():.3f} ms/frame")
+        if grabador.error is not None:
+            print(f"⚠️ La grabación se interrumpió: {grabador.error}")
+    
+    @contextmanager
+    def frame(self, formato: str = "2"):
+        """
+        Vista sin copia (memoryview) de los píxeles del último frame
+        
+        Args:
+            formato: Como Surface.get_view: "2" = enteros de 32 bits por
+                píxel indexados [x, y], "3" = bytes [x, y, canal], "0" =
+                bytes crudos y contiguos de la superficie (para hashes o
+                para escribir el frame a disco)
+        
+        Uso (p.ej. desde callback_frame, para miniaturas, tests o bots):
+            with motor.frame() as pixeles:
+                color = pixeles[x, y]
+        
+        Mientras la vista existe la superficie queda bloqueada (no se
+        puede dibujar en ella): fuera del 'with' la vista se libera y ya
+        no es válida; copiarla (bytes(pixeles)) si se necesita después.
+        """
+        vista = memoryview(self.pantalla.get_view(formato))
+        try:
+            yield vista
+        finally:
+            vista.release()
+    
+    def _avanzar_logica(self, dt: float):
+        """
+        Paso fijo: acumula el tiempo real del frame y ejecuta un tick de
+        lógica por cada paso_fijo completo, así la velocidad del juego no
+        depende de cuánto tarde el render. Lo que sobra queda para el frame
+        siguiente y se expone como alfa = sobrante / paso_fijo.
+        """
+        paso = self.paso_fijo
+        self.acumulador += dt
+        ticks = 0
+        while self.acumulador >= paso:
+            if ticks == self.max_ticks_por_frame:
+                # La lógica no alcanza al tiempo real: se pierde el atraso
+                # en vez de perseguirlo con frames cada vez más lentos
+                descartados = int(self.acumulador // paso)
+                self.ticks_descartados += descartados
+                self.acumulador -= descartados * paso
+                break
+            self.callback_actualizar(paso)
+            self.acumulador -= paso
+            ticks += 1
+        self.ticks += ticks
+        self.alfa = self.acumulador / paso
+    
+    def _bucle_logica(self):
+        """
+        Hilo de lógica (logica_en_hilo): ticks a paso fijo en tiempo real
+        
+        En cada tick aplica, en orden, la entrada y las recargas que el
+        hilo principal encoló con un instante anterior al del tick, corre
+        callback_actualizar y publica callback_estado() en el triple buffer.
+        Este hilo es el único que toca el estado del juego y el
+        ControladorEntrada mientras corre; el principal solo dibuja
+        instantáneas ya publicadas.
+        """
+        paso = self.paso_fijo
+        pendientes = deque()
+        siguiente = time.perf_counter()
+        try:
+            while self.ejecutando:
+                ahora = time.perf_counter()
+                if ahora < siguiente:
+                    time.sleep(siguiente - ahora)
+                    continue
+                # Espiral de la muerte: el atraso de más se descarta
+                atrasados = int((ahora - siguiente) // paso)
+                if atrasados > self.max_ticks_por_frame:
+                    self.ticks_descartados += atrasados
+                    siguiente += atrasados * paso
+                
+                while True:
+                    try:
+                        pendientes.append(self._cola_logica.get_nowait())
+                    except queue.Empty:
+                        break
+                eventos = []
+                while pendientes and pendientes[0][0] <= siguiente:
+                    _, item = pendientes.popleft()
+                    if callable(item):
+                        item()
+                    else:
+                        eventos.extend(item)
+                self.entrada.actualizar(eventos)
+                self.entrada.ejecutar_acciones(tipo="recien_presionada")
+                
+                if not self.pausado and self.callback_actualizar:
+                    self.callback_actualizar(paso)
+                self.ticks += 1
+                self._estados.publicar((siguiente, self.callback_estado()))
+                siguiente += paso
+        except BaseException as e:
+            # Se relanza en el hilo principal al salir de iniciar()
+            self._error_logica = e
+            self.ejecutando = False
+    
     def pausar(self):
         """Pausa/despausa el juego"""
         self.pausado = not self.pausado
@@ -86,56 +368,114 @@ class Motor:
         1. Gestión de eventos (entrada del usuario)
         2. Actualización lógica (física, IA, colisiones)
         3. Renderizado (dibujado en pantalla)
+        
+        Con logica_en_hilo el paso 2 corre en un hilo aparte a su propio
+        ritmo: el hilo principal le entrega los eventos de teclado con el
+        instante en que llegaron y dibuja en cada frame la última
+        instantánea completa que publicó (motor.estado, obtenida de
+        callback_estado), con alfa = fracción del tick siguiente ya
+        transcurrida desde esa instantánea.
         """
         if self.graficos is None:
             raise RuntimeError("Debe cargar un AST antes de iniciar (usar cargar_ast())")
+        if self.logica_en_hilo and self.callback_estado is None:
+            raise RuntimeError("logica_en_hilo requiere callback_estado")
         
         # Inicialización del juego específico
         if self.callback_inicializar:
             self.callback_inicializar()
         
         self.ejecutando = True
+        self.frames = 0
+        self.acumulador = 0.0
+        self.reloj.tick()  # que la carga previa no cuente como tiempo de juego
+        
+        if self.logica_en_hilo:
+            self._estados = BufferTriple((time.perf_counter(), self.callback_estado()))
+            self._error_logica = None
+            self._hilo_logica = threading.Thread(target=self._bucle_logica, name="logica", daemon=True)
+            self._hilo_logica.start()
         
         # ===== GAME LOOP PRINCIPAL =====
-        while self.ejecutando:
-            dt = self.reloj.tick(self.fps) / 1000.0  # Delta time en segundos
+        try:
+            while self.ejecutando:
+                dt = self.reloj.tick(self.fps) / 1000.0  # Delta time en segundos
+            
+                # Recarga en caliente: solo en el borde entre frames
+                if self.recargador is not None:
+                    self._aplicar_recarga()
+            
+                # ----- 1. GESTIÓN DE EVENTOS -----
+                eventos = pygame.event.get()
+                for evento in eventos:
+                    if evento.type == pygame.QUIT:
+                        self.ejecutando = False
+                    # Salir con ESC
+                    if evento.type == pygame.KEYDOWN and evento.key == pygame.K_ESCAPE:
+                        self.ejecutando = False
             
-            # ----- 1. GESTIÓN DE EVENTOS -----
-            eventos = pygame.event.get()
-            for evento in eventos:
-                if evento.type == pygame.QUIT:
-                    self.ejecutando = False
-                # Salir con ESC
-                if evento.type == pygame.KEYDOWN and evento.key == pygame.K_ESCAPE:
-                    self.ejecutando = False
+                if self._hilo_logica is not None:
+                    # La entrada pasa al hilo de lógica; se dibuja su último estado
+                    teclas = [e for e in eventos if e.type in (pygame.KEYDOWN, pygame.KEYUP)]
+                    if teclas:
+                        self._cola_logica.put((time.perf_counter(), teclas))
+                    instante, self.estado = self._estados.leer()
+                    self.alfa = min(1.0, (time.perf_counter() - instante) / self.paso_fijo)
+                else:
+                    # Actualizar estado de entradas
+                    self.entrada.actualizar(eventos)
+                    self.entrada.ejecutar_acciones(tipo="recien_presionada")
             
-            # Actualizar estado de entradas
-            self.entrada.actualizar(eventos)
-            self.entrada.ejecutar_acciones(tipo="recien_presionada")
+                # ----- 2. ACTUALIZACIÓN LÓGICA -----
+                if self._hilo_logica is None and not self.pausado and self.callback_actualizar:
+                    if self.paso_fijo is None:
+                        self.callback_actualizar(dt)
+                    else:
+                        self._avanzar_logica(dt)
             
-            # ----- 2. ACTUALIZACIÓN LÓGICA -----
-            if not self.pausado and self.callback_actualizar:
-                self.callback_actualizar(dt)
+                # ----- 3. RENDERIZADO -----
+                self.graficos.limpiar_pantalla("negro")
             
-            # ----- 3. RENDERIZADO -----
-            self.graficos.limpiar_pantalla("negro")
+                if self.callback_renderizar:
+                    # alfa solo tiene sentido con paso fijo: sin él se conserva
+                    # la firma original renderizar() sin argumentos
+                    if self.paso_fijo is None:
+                        self.callback_renderizar()
+                    else:
+                        self.callback_renderizar(self.alfa)
             
-            if self.callback_renderizar:
-                self.callback_renderizar()
+                # Indicador de pausa
+                if self.pausado:
+                    self.graficos.dibujar_texto(
+                        self.ANCHO_VENTANA // 2 - 60,
+                        self.ALTO_VENTANA // 2,
+                        "PAUSADO",
+                        "amarillo"
+                    )
             
-            # Indicador de pausa
-            if self.pausado:
-                self.graficos.dibujar_texto(
-                    self.ANCHO_VENTANA // 2 - 60,
-                    self.ALTO_VENTANA // 2,
-                    "PAUSADO",
-                    "amarillo"
-                )
+                # flip() completo, o solo los rectángulos sucios
+                self.graficos.presentar()
+                self.frames += 1
             
-            pygame.display.flip()
+                if self.grabador is not None:
+                    self.grabador.capturar(self.pantalla, self.frames)
+            
+                if self.callback_frame:
+                    self.callback_frame(self.frames)
+        
+        finally:
+            # Limpieza (también si un callback lanzó una excepción: el hilo
+            # de lógica no debe seguir tocando el estado del juego)
+            self.ejecutando = False
+            if self._hilo_logica is not None:
+                self._hilo_logica.join()
+                self._hilo_logica = None
+            self.dejar_de_vigilar()
+            self.detener_grabacion()
+            pygame.quit()
         
-        # Limpieza
-        pygame.quit()
+        if self._error_logica is not None:
+            raise self._error_logica
     
     def obtener_parametro(self, ruta: str, default=None):
         """Helper para obtener parámetros del AST"""
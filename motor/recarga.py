@@ -0,0 +1,141 @@
+"""
+Recarga en caliente - Vigila un archivo .brik y lo vuelve a analizar
+en un hilo de fondo mientras el juego sigue corriendo
+"""
+import os
+import threading
+from pathlib import Path
+from collections.abc import Mapping
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from analizador import MatrizEmpaquetada, ParserIncremental
+from .interprete import InterpreteAST, ConfigJuego
+
+
+class Recarga(NamedTuple):
+    """Resultado de un nuevo análisis del .brik, listo para aplicar en el motor"""
+    ast: Optional[Dict[str, Any]]
+    config: Optional[ConfigJuego]
+    claves: Tuple[str, ...]              # bloques de nivel superior que cambiaron
+    error: Optional[Exception] = None    # error de lectura/análisis (el AST vigente se conserva)
+
+
+def _normalizar(valor: Any) -> Any:
+    """Valor comparable con ==: las matrices empaquetadas pasan a listas"""
+    if isinstance(valor, MatrizEmpaquetada):
+        return valor.tolist()
+    if isinstance(valor, Mapping):
+        return {k: _normalizar(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_normalizar(v) for v in valor]
+    return valor
+
+
+def _claves_distintas(base: Mapping, ast: Mapping) -> list:
+    """Claves de nivel superior cuyo valor difiere entre dos ASTs"""
+    return [clave for clave in dict.fromkeys([*ast, *base])
+            if clave not in base or clave not in ast
+            or _normalizar(base[clave]) != _normalizar(ast[clave])]
+
+
+class RecargadorBrik:
+    """
+    Hilo de fondo que revisa periódicamente la firma (mtime, tamaño) de un
+    .brik y, cuando cambia, lo vuelve a analizar con ParserIncremental y
+    compila la nueva configuración.
+
+    El resultado queda pendiente hasta que el motor lo toma con tomar() en el
+    borde de un frame: el game loop nunca espera el análisis, solo el
+    intercambio de una referencia protegido por un lock.
+    """
+
+    def __init__(self, ruta_brik: str, intervalo: float = 0.5, empaquetar_matrices: bool = False,
+                 base: Optional[Mapping] = None):
+        """
+        Args:
+            ruta_brik: Archivo .brik a vigilar
+            intervalo: Segundos entre revisiones del archivo
+            empaquetar_matrices: Igual que 'analizador.py --empaquetar'
+            base: Copia (dict) del AST que el juego cargó realmente (p.ej.
+                de un arbol.ast desactualizado); si el .brik ya difiere de
+                él, la diferencia se publica como la primera recarga. Se lee
+                desde el hilo de vigilancia: no pasar un ASTPerezoso. Sin
+                base, el primer análisis del .brik es la línea base
+        """
+        self.ruta = Path(ruta_brik)
+        self.intervalo = intervalo
+        self._parser = ParserIncremental(empaquetar_matrices=empaquetar_matrices)
+        self._firma: Optional[Tuple[int, int]] = None
+        self._base = base
+        self._pendiente: Optional[Recarga] = None
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    def iniciar(self):
+        """Arranca el hilo de vigilancia (daemon: no impide cerrar el juego)"""
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._vigilar, name=f"recarga-{self.ruta.name}", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        """Detiene el hilo de vigilancia"""
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=max(1.0, self.intervalo * 2))
+            self._hilo = None
+
+    def tomar(self) -> Optional[Recarga]:
+        """Retorna (y consume) la recarga pendiente, o None si no hay cambios"""
+        with self._lock:
+            recarga, self._pendiente = self._pendiente, None
+        return recarga
+
+    def _firma_actual(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.ruta)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _vigilar(self):
+        # El primer análisis fija la línea base: el juego ya cargó su AST
+        self._revisar(inicial=True)
+        while not self._detener.wait(self.intervalo):
+            self._revisar()
+
+    def _revisar(self, inicial: bool = False):
+        """Vuelve a analizar el .brik si su firma cambió desde la última revisión"""
+        firma = self._firma_actual()
+        if firma is None or firma == self._firma:
+            return
+        self._firma = firma
+        try:
+            texto = self.ruta.read_text(encoding='utf-8')
+            claves = self._parser.actualizar(texto)
+            if self._base is not None:
+                # Primer análisis correcto: los cambios se miden contra el
+                # AST cargado, no contra un .brik que el juego nunca vio
+                claves = _claves_distintas(self._base, self._parser.ast)
+                self._base = None
+            elif inicial:
+                return
+            if not claves:
+                return
+            # ParserIncremental reemplaza valores sin mutarlos: basta copiar
+            # el dict raíz para que el motor tenga un AST que ya no cambia
+            interprete = InterpreteAST.desde_ast(dict(self._parser.ast), self.ruta)
+            recarga = Recarga(interprete.ast, interprete.config, tuple(claves))
+        except Exception as e:
+            # Un .brik a medio editar no debe matar el hilo ni el juego
+            if inicial and self._base is None:
+                return
+            recarga = Recarga(None, None, (), e)
+        with self._lock:
+            self._pendiente = recarga
+
+    def __repr__(self) -> str:
+        estado = "activo" if self._hilo is not None and self._hilo.is_alive() else "detenido"
+        return f"RecargadorBrik({self.ruta}, {estado})"
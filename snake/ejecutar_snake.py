@@ -6,23 +6,42 @@ Demuestra la Entrega 2: Motor Gráfico y de Juego
 Uso:
     cd PP_TLP
     python snake/ejecutar_snake.py
+    python snake/ejecutar_snake.py --recargar   (aplica en caliente los cambios de snake.brik)
+    python snake/ejecutar_snake.py --rects-sucios   (actualiza en pantalla solo las zonas que cambian)
+    python snake/ejecutar_snake.py --grabar   (graba la partida en snake/partida.frames)
+    python snake/ejecutar_snake.py --hilos   (la lógica corre en un hilo aparte del render)
 """
 import sys
 from pathlib import Path
 import random
 import time
+from typing import NamedTuple, Optional, Tuple
 
 # Agregar el directorio raíz al path para importar el motor
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from motor import Motor
 
+class EstadoSnake(NamedTuple):
+    """Instantánea inmutable de lo que se dibuja (ver JuegoSnake.capturar_estado)"""
+    snake_pos: Tuple[Tuple[int, int], ...]
+    color_snake: str
+    manzana: Optional[Tuple[int, int, str, str]]   # (x, y, color, forma)
+    score: int
+    vidas: int
+    vidas_maximas: int
+    velocidad: float
+    efectos: Tuple[Tuple[str, float], ...]         # (nombre, segundos restantes)
+    juego_terminado: bool
+
 class Manzana:
     """Representa una manzana con tipo"""
     def __init__(self, pos, tipo, config):
         self.pos = pos
         self.tipo = tipo
         self.config = config
+        # (x, y, color, forma) listo para dibujar_ladrillo, resuelto una vez
+        self.dibujo = (*pos, config.get("color", "rojo"), config.get("forma", "cuadro"))
 
 class Efecto:
     """Representa un efecto temporal activo"""
@@ -40,6 +59,10 @@ class Efecto:
 class JuegoSnake:
     """Lógica específica del juego Snake"""
     
+    # Panel lateral del HUD (score, vidas, efectos) a la derecha del tablero
+    ANCHO_PANEL = 140   # píxeles de la ventana que se reservan para el panel
+    MARGEN_PANEL = 20   # separación entre el tablero y los textos del panel
+    
     def __init__(self, motor: Motor):
         self.motor = motor
         self.ast = motor.interprete
@@ -60,8 +83,17 @@ class JuegoSnake:
         self.efectos = []
         
         # Dimensiones del tablero
-        params = self.ast.obtener_parametros_generales()
-        self.ancho_grid, self.alto_grid = params["dimensiones"]
+        self.ancho_grid, self.alto_grid = self.ast.config.general.dimensiones
+        
+        # Si el tablero no cabe junto al panel lateral, una cámara sigue a la cabeza
+        self.camara = None
+        graficos = motor.graficos
+        ancho_vista = Motor.ANCHO_VENTANA - self.ANCHO_PANEL
+        ancho_px = self.ancho_grid * graficos.tam_celda
+        alto_px = self.alto_grid * graficos.tam_celda
+        if ancho_px > ancho_vista or alto_px > Motor.ALTO_VENTANA:
+            self.camara = graficos.usar_camara(min(ancho_px, ancho_vista), min(alto_px, Motor.ALTO_VENTANA),
+                                               self.ancho_grid, self.alto_grid)
         
         # Configuraciones de manzanas
         self.configs_manzanas = self.ast.obtener_manzanas()
@@ -106,18 +138,18 @@ class JuegoSnake:
         """Inicializa el estado del juego desde el AST"""
         # Reglas iniciales (solo la primera vez)
         if self.vidas == 0:
-            reglas = self.ast.obtener_reglas()
-            self.vidas = reglas["vidas_iniciales"]
-            self.vidas_maximas = reglas["vidas_iniciales"]
-            self.score = reglas["score_inicial"]
+            reglas = self.ast.config.reglas
+            self.vidas = reglas.vidas_iniciales
+            self.vidas_maximas = reglas.vidas_iniciales
+            self.score = reglas.score_inicial
         
         # Configuración de snake
-        config_snake = self.ast.obtener_config_snake()
-        self.velocidad_base = config_snake["velocidad_inicial"]
+        config_snake = self.ast.config.snake
+        self.velocidad_base = config_snake.velocidad_inicial
         self.velocidad = self.velocidad_base
         
         # Posición inicial de la snake (centro del tablero)
-        largo_inicial = config_snake["dimensiones"][1]
+        largo_inicial = config_snake.dimensiones[1]
         centro_x = self.ancho_grid // 2
         centro_y = self.alto_grid // 2
         self.snake_pos = [(centro_x - i, centro_y) for i in range(largo_inicial)]
@@ -140,6 +172,27 @@ class JuegoSnake:
         
         print(f"🐍 Snake reiniciado - Vidas: {self.vidas}/{self.vidas_maximas}, Velocidad: {self.velocidad}")
     
+    def recargar(self, claves):
+        """
+        Aplica los cambios del .brik recargado en caliente sin reiniciar la
+        partida (las dimensiones del tablero se conservan hasta reiniciar)
+        """
+        if "manzanas" in claves:
+            self.configs_manzanas = self.ast.obtener_manzanas()
+            self.calcular_probabilidades()
+        
+        if "snake" in claves:
+            # Conserva los aumentos ya ganados sobre la nueva velocidad base
+            nueva_base = self.ast.config.snake.velocidad_inicial
+            self.velocidad += nueva_base - self.velocidad_base
+            self.velocidad_base = nueva_base
+        
+        if "reglas" in claves:
+            self.vidas_maximas = self.ast.config.reglas.vidas_iniciales
+            self.vidas = min(self.vidas, self.vidas_maximas)
+        
+        print(f"🔄 snake.brik recargado: {', '.join(claves)}")
+    
     def cambiar_direccion(self, dx: int, dy: int):
         """Cambia la dirección del snake (evita reversa)"""
         # No permitir reversa (moverse 180° al instante)
@@ -191,12 +244,15 @@ class JuegoSnake:
             if efecto.nombre == "velocidad_x2":
                 velocidad_efectiva *= 2
         
-        # Control de velocidad (movimiento basado en tiempo)
-        self.tiempo_acumulado += dt
+        # Control de velocidad (movimiento basado en tiempo): el sobrante se
+        # conserva y puede haber varios movimientos por tick, así la velocidad
+        # es exacta aunque supere los ticks por segundo del motor
         tiempo_por_movimiento = 1.0 / velocidad_efectiva
+        # Al acelerar (manzana envenenada) no se "cobra" de golpe el tiempo acumulado
+        self.tiempo_acumulado = min(self.tiempo_acumulado + dt, tiempo_por_movimiento + dt)
         
-        if self.tiempo_acumulado >= tiempo_por_movimiento:
-            self.tiempo_acumulado = 0
+        while self.tiempo_acumulado >= tiempo_por_movimiento and not self.juego_terminado:
+            self.tiempo_acumulado -= tiempo_por_movimiento
             self.mover_snake()
     
     def mover_snake(self):
@@ -286,8 +342,7 @@ class JuegoSnake:
     
     def aumentar_velocidad(self):
         """Aumenta la velocidad base del snake"""
-        config_snake = self.ast.obtener_config_snake()
-        self.velocidad += config_snake["aumento_velocidad"]
+        self.velocidad += self.ast.config.snake.aumento_velocidad
     
     def perder_vida(self):
         """Maneja la pérdida de una vida"""
@@ -315,51 +370,85 @@ class JuegoSnake:
         self.inicializar()
         print("🔄 Juego reiniciado completamente")
     
-    def renderizar(self):
-        """Dibuja el juego en pantalla"""
+    def capturar_estado(self) -> EstadoSnake:
+        """
+        Instantánea inmutable del estado que dibuja renderizar(); con
+        --hilos el motor la pide al hilo de lógica después de cada tick
+        """
+        return EstadoSnake(
+            snake_pos=tuple(self.snake_pos),
+            color_snake=self.ast.config.snake.color,
+            manzana=self.manzana_actual.dibujo if self.manzana_actual else None,
+            score=self.score,
+            vidas=self.vidas,
+            vidas_maximas=self.vidas_maximas,
+            velocidad=self.velocidad,
+            efectos=tuple((e.nombre, e.tiempo_restante()) for e in self.efectos),
+            juego_terminado=self.juego_terminado
+        )
+    
+    def renderizar(self, alfa: float = 1.0):
+        """Dibuja el juego en pantalla (la snake avanza de a celdas: alfa no se usa)"""
+        estado = self.motor.estado
+        if estado is not None:
+            # Con la lógica en otro hilo se dibuja su última instantánea publicada
+            self.dibujar(*estado)
+        else:
+            # En un solo hilo se dibuja directo del estado vivo, sin armar
+            # una instantánea por frame
+            self.dibujar(
+                self.snake_pos,
+                self.ast.config.snake.color,
+                self.manzana_actual.dibujo if self.manzana_actual else None,
+                self.score,
+                self.vidas,
+                self.vidas_maximas,
+                self.velocidad,
+                ((e.nombre, e.tiempo_restante()) for e in self.efectos),
+                self.juego_terminado
+            )
+    
+    def dibujar(self, snake_pos, color_snake, manzana, score, vidas, vidas_maximas, velocidad,
+                efectos, juego_terminado):
+        """Dibuja un estado del juego (mismos campos y orden que EstadoSnake)"""
+        if self.camara is not None and snake_pos:
+            self.motor.graficos.seguir_celda(*snake_pos[0])
+        
         # Dibujar cuadrícula con baja opacidad
         self.motor.graficos.dibujar_cuadricula(self.ancho_grid, self.alto_grid, "gris", opacidad=0.15)
         
         # Dibujar snake
-        config_snake = self.ast.obtener_config_snake()
-        color_snake = config_snake["color"]
-        
-        for i, (x, y) in enumerate(self.snake_pos):
-            # Cabeza más clara
-            color = "amarillo" if i == 0 else color_snake
-            self.motor.graficos.dibujar_ladrillo(x, y, color)
+        # Cabeza más clara (un solo blit por lotes para todo el cuerpo)
+        self.motor.graficos.dibujar_ladrillos(
+            (x, y, "amarillo" if i == 0 else color_snake)
+            for i, (x, y) in enumerate(snake_pos)
+        )
         
         # Dibujar manzana
-        if self.manzana_actual:
-            config = self.manzana_actual.config
-            color_manzana = config.get("color", "rojo")
-            forma_manzana = config.get("forma", "cuadro")
-            
-            self.motor.graficos.dibujar_ladrillo(
-                self.manzana_actual.pos[0],
-                self.manzana_actual.pos[1],
-                color_manzana,
-                forma_manzana
-            )
+        if manzana:
+            self.motor.graficos.dibujar_ladrillo(*manzana)
         
         # UI - Score y vidas (fuera del área de juego)
-        ui_x = self.ancho_grid * self.motor.graficos.tam_celda + 20
-        self.motor.graficos.dibujar_texto(ui_x, 20, f"Score: {self.score}", "blanco", pequeño=True)
-        self.motor.graficos.dibujar_texto(ui_x, 50, f"Vidas: {self.vidas}/{self.vidas_maximas}", "blanco", pequeño=True)
-        self.motor.graficos.dibujar_texto(ui_x, 80, f"Vel: {self.velocidad:.1f}", "blanco", pequeño=True)
+        # Las etiquetas solo se vuelven a rasterizar cuando cambia su texto
+        if self.camara is not None:
+            ui_x = self.camara.vista.right + self.MARGEN_PANEL
+        else:
+            ui_x = self.ancho_grid * self.motor.graficos.tam_celda + self.MARGEN_PANEL
+        self.motor.graficos.dibujar_etiqueta("score", ui_x, 20, f"Score: {score}", "blanco", pequeño=True)
+        self.motor.graficos.dibujar_etiqueta("vidas", ui_x, 50, f"Vidas: {vidas}/{vidas_maximas}", "blanco", pequeño=True)
+        self.motor.graficos.dibujar_etiqueta("velocidad", ui_x, 80, f"Vel: {velocidad:.1f}", "blanco", pequeño=True)
         
         # Mostrar efectos activos
         y_offset = 110
-        for efecto in self.efectos:
-            tiempo = efecto.tiempo_restante()
-            if efecto.nombre == "score_x2":
-                self.motor.graficos.dibujar_texto(ui_x, y_offset, f"⭐ x2: {tiempo:.1f}s", "amarillo", pequeño=True)
-            elif efecto.nombre == "velocidad_x2":
-                self.motor.graficos.dibujar_texto(ui_x, y_offset, f"☠️ Fast: {tiempo:.1f}s", "rojo", pequeño=True)
+        for i, (nombre, tiempo) in enumerate(efectos):
+            if nombre == "score_x2":
+                self.motor.graficos.dibujar_etiqueta(f"efecto_{i}", ui_x, y_offset, f"⭐ x2: {tiempo:.1f}s", "amarillo", pequeño=True)
+            elif nombre == "velocidad_x2":
+                self.motor.graficos.dibujar_etiqueta(f"efecto_{i}", ui_x, y_offset, f"☠️ Fast: {tiempo:.1f}s", "rojo", pequeño=True)
             y_offset += 25
         
         # Mensaje de game over
-        if self.juego_terminado:
+        if juego_terminado:
             self.motor.graficos.dibujar_texto(150, 200, "GAME OVER", "rojo")
             self.motor.graficos.dibujar_texto(120, 240, "Presiona Q para reiniciar", "blanco", pequeño=True)
 
@@ -367,11 +456,12 @@ class JuegoSnake:
 def main():
     """Punto de entrada del juego Snake"""
     # Crear motor
-    motor = Motor(titulo="Snake .brik", fps=60)
+    motor = Motor(titulo="Snake .brik", fps=60, rects_sucios="--rects-sucios" in sys.argv[1:],
+                  ticks_por_segundo=120, logica_en_hilo="--hilos" in sys.argv[1:])
     
-    # Cargar configuración desde AST
-    ruta_ast = Path(__file__).parent / "arbol.ast"
-    motor.cargar_ast(str(ruta_ast), tam_celda=10)
+    # Cargar configuración directamente desde el .brik (sin pasar por arbol.ast)
+    ruta_brik = Path(__file__).parent / "snake.brik"
+    motor.cargar_ast(str(ruta_brik), tam_celda=10)
     
     # Crear juego
     juego = JuegoSnake(motor)
@@ -380,6 +470,16 @@ def main():
     motor.callback_inicializar = juego.inicializar
     motor.callback_actualizar = juego.actualizar
     motor.callback_renderizar = juego.renderizar
+    motor.callback_recargar = juego.recargar
+    motor.callback_estado = juego.capturar_estado
+    
+    # Recarga en caliente del .brik
+    if "--recargar" in sys.argv[1:]:
+        motor.vigilar_brik(str(ruta_brik))
+    
+    # Grabación de la partida (frames comprimidos, sin frenar el juego)
+    if "--grabar" in sys.argv[1:]:
+        motor.grabar(str(Path(__file__).parent / "partida.frames"), comprimir=True)
     
     # Iniciar motor
     print("=" * 50)
@@ -6,6 +6,9 @@ Demuestra la Entrega 2: Motor Gráfico y de Juego
 Uso:
     cd PP_TLP
     python tetris/ejecutar_tetris.py
+    python tetris/ejecutar_tetris.py --recargar   (aplica en caliente los cambios de tetris.brik)
+    python tetris/ejecutar_tetris.py --rects-sucios   (actualiza en pantalla solo las zonas que cambian)
+    python tetris/ejecutar_tetris.py --grabar   (graba la partida en tetris/partida.frames)
 """
 import sys
 from pathlib import Path
@@ -14,7 +17,7 @@ import random
 # Agregar el directorio raíz al path para importar el motor
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from motor import Motor
+from motor import Motor, registro_ast
 
 
 class Pieza:
@@ -84,18 +87,21 @@ class JuegoTetris:
         self.tablero = []
         self.juego_terminado = False
         
+        # Capa con los bloques fijos: solo se vuelve a pintar al fijar una
+        # pieza o al eliminar líneas, no en cada frame
+        self.capa_tablero = None
+        
         # Control de velocidad
         self.velocidad = 0
         self.tiempo_acumulado = 0
         self.tiempo_drop_rapido = 0.05  # Segundos cuando se presiona bajar
         
         # Dimensiones del tablero
-        params = self.ast.obtener_parametros_generales()
-        self.ancho_tablero, self.alto_tablero = params["dimensiones"]
+        self.ancho_tablero, self.alto_tablero = self.ast.config.general.dimensiones
         
-        # Configuraciones
-        self.config_puntaje = self.ast.obtener_puntaje_config()
-        self.reglas = self.ast.obtener_reglas()
+        # Configuraciones (compiladas una vez por el intérprete)
+        self.config_puntaje = self.ast.config.puntaje
+        self.reglas = self.ast.config.reglas
         self.piezas_disponibles = self.ast.obtener_piezas_tetris()
     
     def inicializar(self):
@@ -103,9 +109,11 @@ class JuegoTetris:
         # Limpiar tablero
         self.tablero = [[None for _ in range(self.ancho_tablero)] 
                         for _ in range(self.alto_tablero)]
+        self.capa_tablero = self.motor.graficos.crear_capa(self.ancho_tablero, self.alto_tablero)
+        self.motor.graficos.marcar_celdas_sucias(0, 0, self.ancho_tablero, self.alto_tablero)
         
         # Configurar velocidad inicial
-        self.velocidad = self.reglas.get("tick_base", 1.0)
+        self.velocidad = self.reglas.tick_base
         
         # Reset de estadísticas
         self.score = 0
@@ -135,6 +143,24 @@ class JuegoTetris:
         
         print(f"Tetris iniciado - Nivel: {self.nivel}, Velocidad: {self.velocidad:.2f}s")
     
+    def recargar(self, claves):
+        """
+        Aplica los cambios del .brik recargado en caliente sin reiniciar la
+        partida (las dimensiones del tablero se conservan hasta reiniciar)
+        """
+        self.config_puntaje = self.ast.config.puntaje
+        self.reglas = self.ast.config.reglas
+        
+        if "piezas" in claves:
+            self.piezas_disponibles = self.ast.obtener_piezas_tetris()
+        
+        if "reglas" in claves:
+            # Misma velocidad que se tendría llegando al nivel actual con las reglas nuevas
+            incremento = self.reglas.incremento_velocidad * (self.nivel - 1)
+            self.velocidad = max(0.1, self.reglas.tick_base - incremento) if incremento else self.reglas.tick_base
+        
+        print(f"tetris.brik recargado: {', '.join(claves)}")
+    
     def generar_pieza_aleatoria(self) -> Pieza:
         """Genera una pieza aleatoria de las disponibles"""
         tipo = random.choice(list(self.piezas_disponibles.keys()))
@@ -231,7 +257,7 @@ class JuegoTetris:
     
     def hard_drop(self):
         """Suelta la pieza instantáneamente"""
-        if self.juego_terminado or not self.reglas.get("hard_drop", True):
+        if self.juego_terminado or not self.reglas.hard_drop:
             return
         
         while True:
@@ -247,9 +273,6 @@ class JuegoTetris:
         if self.juego_terminado:
             return
         
-        # Control de velocidad (caída automática)
-        self.tiempo_acumulado += dt
-        
         # Velocidad ajustada si se está bajando rápido
         velocidad_actual = self.velocidad
         if self.motor.entrada.esta_presionada("S"):
@@ -257,8 +280,12 @@ class JuegoTetris:
         
         tiempo_por_tick = velocidad_actual
         
-        if self.tiempo_acumulado >= tiempo_por_tick:
-            self.tiempo_acumulado = 0
+        # Control de velocidad (caída automática): el sobrante se conserva;
+        # al pasar a la bajada rápida no se cobra de golpe lo acumulado
+        self.tiempo_acumulado = min(self.tiempo_acumulado + dt, tiempo_por_tick + dt)
+        
+        while self.tiempo_acumulado >= tiempo_por_tick and not self.juego_terminado:
+            self.tiempo_acumulado -= tiempo_por_tick
             self.bajar_pieza()
     
     def bajar_pieza(self):
@@ -271,9 +298,16 @@ class JuegoTetris:
     
     def fijar_pieza(self):
         """Fija la pieza actual en el tablero"""
-        for x, y in self.pieza_actual.obtener_bloques():
-            if 0 <= y < self.alto_tablero:
-                self.tablero[y][x] = self.pieza_actual.color
+        bloques = [(x, y) for x, y in self.pieza_actual.obtener_bloques() if 0 <= y < self.alto_tablero]
+        color = self.pieza_actual.color
+        for x, y in bloques:
+            self.tablero[y][x] = color
+        
+        # Pintar solo los bloques nuevos en la capa del tablero
+        graficos = self.motor.graficos
+        graficos.dibujar_ladrillos(((x, y, color) for x, y in bloques), destino=self.capa_tablero)
+        for x, y in bloques:
+            graficos.marcar_celdas_sucias(x, y)
         
         # Verificar líneas completas
         lineas_eliminadas = self.verificar_lineas_completas()
@@ -296,29 +330,46 @@ class JuegoTetris:
         for y in reversed(lineas_completas):
             del self.tablero[y]
             self.tablero.insert(0, [None] * self.ancho_tablero)
+            self.desplazar_capa(y)
         
         return len(lineas_completas)
     
+    def desplazar_capa(self, y: int):
+        """
+        Refleja en la capa del tablero la eliminación de la fila y: desplaza
+        una fila hacia abajo todo lo que está encima (Surface.scroll, sin
+        volver a pintar ladrillos) y deja vacía la fila superior
+        """
+        tam = self.motor.graficos.tam_celda
+        ancho_px = self.ancho_tablero * tam
+        
+        self.capa_tablero.set_clip((0, 0, ancho_px, (y + 1) * tam))
+        self.capa_tablero.scroll(0, tam)
+        self.capa_tablero.set_clip(None)
+        self.capa_tablero.fill((0, 0, 0, 0), (0, 0, ancho_px, tam))
+        
+        self.motor.graficos.marcar_celdas_sucias(0, 0, self.ancho_tablero, y + 1)
+    
     def procesar_lineas_eliminadas(self, cantidad: int):
         """Procesa el puntaje y nivel por líneas eliminadas"""
         # Puntaje base
-        puntos = self.config_puntaje["score_por_linea"] * cantidad
+        puntos = self.config_puntaje.score_por_linea * cantidad
         
         # Bonus por Tetris (4 líneas)
         if cantidad == 4:
-            puntos += self.config_puntaje["tetris_bonus"]
+            puntos += self.config_puntaje.tetris_bonus
             print("¡TETRIS! +800 puntos")
         
         self.score += puntos
         self.lineas_completadas += cantidad
         
         # Aumentar nivel y velocidad
-        lineas_por_nivel = self.reglas.get("lineas_por_nivel", 10)
+        lineas_por_nivel = self.reglas.lineas_por_nivel
         nuevo_nivel = (self.lineas_completadas // lineas_por_nivel) + 1
         
         if nuevo_nivel > self.nivel:
             self.nivel = nuevo_nivel
-            incremento = self.reglas.get("incremento_velocidad", 0.1)
+            incremento = self.reglas.incremento_velocidad
             self.velocidad = max(0.1, self.velocidad - incremento)
             print(f"¡Nivel {self.nivel}! Velocidad: {self.velocidad:.2f}s")
         
@@ -326,7 +377,7 @@ class JuegoTetris:
     
     def calcular_posicion_ghost(self) -> int:
         """Calcula la posición Y donde caería la pieza (ghost piece)"""
-        if not self.reglas.get("ghost_piece", True):
+        if not self.reglas.ghost_piece:
             return None
         
         y_original = self.pieza_actual.y
@@ -352,8 +403,8 @@ class JuegoTetris:
         self.inicializar()
         print("Juego reiniciado")
     
-    def renderizar(self):
-        """Dibuja el juego en pantalla"""
+    def renderizar(self, alfa: float = 1.0):
+        """Dibuja el juego en pantalla (las piezas caen de a celdas: alfa no se usa)"""
         # Dibujar cuadrícula de fondo
         self.motor.graficos.dibujar_cuadricula(
             self.ancho_tablero,
@@ -361,11 +412,8 @@ class JuegoTetris:
             "gris"
         )
         
-        # Dibujar bloques fijos en el tablero
-        for y in range(self.alto_tablero):
-            for x in range(self.ancho_tablero):
-                if self.tablero[y][x] is not None:
-                    self.motor.graficos.dibujar_ladrillo(x, y, self.tablero[y][x])
+        # Dibujar bloques fijos en el tablero (capa ya pintada)
+        self.motor.graficos.dibujar_capa(self.capa_tablero)
         
         # Dibujar ghost piece (pieza fantasma)
         if not self.juego_terminado:
@@ -390,34 +438,36 @@ class JuegoTetris:
         
         # Dibujar pieza actual
         if self.pieza_actual and not self.juego_terminado:
-            for x, y in self.pieza_actual.obtener_bloques():
-                if y >= 0:  # No dibujar bloques por encima del tablero
-                    self.motor.graficos.dibujar_ladrillo(x, y, self.pieza_actual.color)
+            color = self.pieza_actual.color
+            self.motor.graficos.dibujar_ladrillos(
+                (x, y, color)
+                for x, y in self.pieza_actual.obtener_bloques()
+                if y >= 0  # No dibujar bloques por encima del tablero
+            )
         
         # UI - Panel derecho
         ui_x = self.ancho_tablero * self.motor.graficos.tam_celda + 20
         
-        # Estadísticas
-        self.motor.graficos.dibujar_texto(ui_x, 20, f"Score: {self.score}", "blanco", pequeño=True)
-        self.motor.graficos.dibujar_texto(ui_x, 50, f"Líneas: {self.lineas_completadas}", "blanco", pequeño=True)
-        self.motor.graficos.dibujar_texto(ui_x, 80, f"Nivel: {self.nivel}", "blanco", pequeño=True)
+        # Estadísticas (solo se vuelven a rasterizar cuando cambian)
+        self.motor.graficos.dibujar_etiqueta("score", ui_x, 20, f"Score: {self.score}", "blanco", pequeño=True)
+        self.motor.graficos.dibujar_etiqueta("lineas", ui_x, 50, f"Líneas: {self.lineas_completadas}", "blanco", pequeño=True)
+        self.motor.graficos.dibujar_etiqueta("nivel", ui_x, 80, f"Nivel: {self.nivel}", "blanco", pequeño=True)
         
         # Vista previa de siguiente pieza
-        if self.reglas.get("vista_previa", 1) > 0 and self.pieza_siguiente:
+        if self.reglas.vista_previa > 0 and self.pieza_siguiente:
             self.motor.graficos.dibujar_texto(ui_x, 120, "Siguiente:", "blanco", pequeño=True)
             
             matriz_preview = self.pieza_siguiente.obtener_matriz()
             offset_x = ui_x // self.motor.graficos.tam_celda
             offset_y = 150 // self.motor.graficos.tam_celda
             
-            for i, fila in enumerate(matriz_preview):
-                for j, celda in enumerate(fila):
-                    if celda == 1:
-                        self.motor.graficos.dibujar_ladrillo(
-                            offset_x + j,
-                            offset_y + i,
-                            self.pieza_siguiente.color
-                        )
+            color = self.pieza_siguiente.color
+            self.motor.graficos.dibujar_ladrillos(
+                (offset_x + j, offset_y + i, color)
+                for i, fila in enumerate(matriz_preview)
+                for j, celda in enumerate(fila)
+                if celda == 1
+            )
         
         # Mensaje de game over
         if self.juego_terminado:
@@ -428,18 +478,16 @@ class JuegoTetris:
 def main():
     """Punto de entrada del juego Tetris"""
     # Crear motor
-    motor = Motor(titulo="Tetris .brik", fps=60)
+    motor = Motor(titulo="Tetris .brik", fps=60, rects_sucios="--rects-sucios" in sys.argv[1:],
+                  ticks_por_segundo=120)
     
-    # Cargar configuración desde AST
-    ruta_ast = Path(__file__).parent / "arbol.ast"
+    # Cargar configuración directamente desde el .brik (sin pasar por arbol.ast)
+    ruta_brik = Path(__file__).parent / "tetris.brik"
     
-    # Obtener tamaño de celda del AST
-    import json
-    with open(ruta_ast, 'r', encoding='utf-8') as f:
-        ast_data = json.load(f)
-    tam_celda = ast_data.get("parametros_generales", {}).get("celda", 16)
+    # Obtener tamaño de celda del AST (cargar_ast reutiliza este mismo intérprete)
+    tam_celda = registro_ast.obtener(str(ruta_brik)).obtener("parametros_generales.celda", 16)
     
-    motor.cargar_ast(str(ruta_ast), tam_celda=tam_celda)
+    motor.cargar_ast(str(ruta_brik), tam_celda=tam_celda)
     
     # Crear juego
     juego = JuegoTetris(motor)
@@ -448,6 +496,15 @@ def main():
     motor.callback_inicializar = juego.inicializar
     motor.callback_actualizar = juego.actualizar
     motor.callback_renderizar = juego.renderizar
+    motor.callback_recargar = juego.recargar
+    
+    # Recarga en caliente del .brik
+    if "--recargar" in sys.argv[1:]:
+        motor.vigilar_brik(str(ruta_brik))
+    
+    # Grabación de la partida (frames comprimidos, sin frenar el juego)
+    if "--grabar" in sys.argv[1:]:
+        motor.grabar(str(Path(__file__).parent / "partida.frames"), comprimir=True)
     
     # Iniciar motor
     print("=" * 50)